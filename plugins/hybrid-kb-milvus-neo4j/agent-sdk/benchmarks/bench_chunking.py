@@ -0,0 +1,102 @@
+"""
+Chunking Benchmark
+==================
+Compara o chunker legado (FileProcessor._chunk_text) com o TextChunker.
+
+Usage:
+    python benchmarks/bench_chunking.py --mb 1 5 20 --chunk-size 512 --overlap 50
+"""
+
+import argparse
+import random
+import time
+from typing import List
+
+from knowledge_base_agent.processing.chunking import TextChunker
+
+
+def legacy_chunk_text(text: str, chunk_size: int = 512, overlap: int = 50) -> List[str]:
+    """The original FileProcessor._chunk_text, kept verbatim for comparison."""
+    if not text:
+        return []
+
+    # Split by sentences
+    import re
+    sentences = re.split(r'(?<=[.!?])\s+', text)
+
+    chunks = []
+    current_chunk = ""
+
+    for sentence in sentences:
+        if len(current_chunk) + len(sentence) < chunk_size:
+            current_chunk += sentence + " "
+        else:
+            if current_chunk:
+                chunks.append(current_chunk.strip())
+            # Start new chunk with overlap
+            overlap_text = current_chunk[-overlap:] if len(current_chunk) > overlap else ""
+            current_chunk = overlap_text + sentence + " "
+
+    if current_chunk.strip():
+        chunks.append(current_chunk.strip())
+
+    return chunks if chunks else [text[:chunk_size]]
+
+
+def make_text(size_bytes: int, seed: int = 42) -> str:
+    """Generate prose-like text with sentences of varying length."""
+    rng = random.Random(seed)
+    vocabulary = [
+        "knowledge", "base", "vector", "graph", "entity", "document", "chunk",
+        "search", "index", "query", "embedding", "relation", "the", "of", "and",
+        "a", "to", "in", "is", "for", "with", "on", "processing", "pipeline"
+    ]
+    parts = []
+    size = 0
+    while size < size_bytes:
+        words = rng.choices(vocabulary, k=rng.randint(4, 40))
+        sentence = " ".join(words).capitalize() + rng.choice([".", ".", ".", "!", "?"])
+        if rng.random() < 0.05:
+            sentence += "\n\n"
+        parts.append(sentence)
+        size += len(sentence) + 1
+    return " ".join(parts)
+
+
+def timed(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mb", type=float, nargs="+", default=[1, 5, 20])
+    parser.add_argument("--chunk-size", type=int, default=512)
+    parser.add_argument("--overlap", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    chunker = TextChunker(args.chunk_size, args.overlap)
+    token_chunker = TextChunker(args.chunk_size // 4, args.overlap // 4, unit="tokens")
+
+    print(f"{'size':>8} {'legacy':>10} {'chars':>10} {'tokens':>10} {'speedup':>8} {'chunks':>8}")
+    for mb in args.mb:
+        text = make_text(int(mb * 1024 * 1024))
+
+        legacy = timed(lambda text=text: legacy_chunk_text(text, args.chunk_size, args.overlap), args.repeat)
+        chars = timed(lambda text=text: chunker.chunk(text), args.repeat)
+        tokens = timed(lambda text=text: token_chunker.chunk(text), args.repeat)
+        count = len(chunker.chunk(text))
+
+        print(
+            f"{mb:>6.1f}MB {legacy:>9.3f}s {chars:>9.3f}s {tokens:>9.3f}s "
+            f"{legacy / chars:>7.1f}x {count:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
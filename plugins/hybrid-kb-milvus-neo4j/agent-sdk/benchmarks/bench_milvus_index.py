@@ -0,0 +1,182 @@
+"""
+Milvus Index Benchmark
+======================
+Mede recall@k x latência para perfis de índice (IndexProfile) e parâmetros de busca.
+
+Builds one collection per index profile (same schema and index parameters
+as EmbeddingService.create_collection), then sweeps the search params and
+reports recall against exact cosine top-k, plus latency percentiles.
+
+Runs against a Milvus server (--uri http://localhost:19530) or milvus-lite
+(--uri ./bench_milvus.db, needs `pip install milvus-lite`; Lite only has
+FLAT/IVF_FLAT/AUTOINDEX-style indexes, so use a server for HNSW/DISKANN).
+
+Usage:
+    python benchmarks/bench_milvus_index.py --uri http://localhost:19530 --rows 200000 \\
+        --index HNSW:M=16,efConstruction=200 --index IVF_FLAT:nlist=1024 \\
+        --sweep ef=16,32,64,128,256 --sweep nprobe=4,16,64
+"""
+
+import argparse
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+from pymilvus import DataType, MilvusClient
+
+from knowledge_base_agent.processing.embeddings import EmbeddingService
+from knowledge_base_agent.processing.index_profiles import INDEX_TYPES, IndexProfile
+
+COLLECTION_PREFIX = "bench_index_"
+
+
+def parse_index(spec: str) -> IndexProfile:
+    """'HNSW:M=16,efConstruction=200' -> IndexProfile."""
+    index_type, _, params = spec.partition(":")
+    build = {}
+    for item in filter(None, params.split(",")):
+        key, _, value = item.partition("=")
+        build[key] = int(value)
+    return IndexProfile.create(index_type, build)
+
+
+def parse_sweep(specs: List[str]) -> Dict[str, List[int]]:
+    """['ef=16,32', 'nprobe=4,16'] -> {'ef': [16, 32], 'nprobe': [4, 16]}."""
+    sweep = {}
+    for spec in specs:
+        key, _, values = spec.partition("=")
+        sweep[key] = [int(v) for v in values.split(",") if v]
+    return sweep
+
+
+def make_vectors(rows: int, queries: int, dim: int, clusters: int, seed: int = 42) -> Tuple[np.ndarray, np.ndarray]:
+    """Normalized vectors drawn around random centroids (embeddings are clustered, not uniform)."""
+    rng = np.random.default_rng(seed)
+    centroids = rng.normal(size=(clusters, dim)).astype(np.float32)
+
+    def sample(n: int, spread: float) -> np.ndarray:
+        vectors = centroids[rng.integers(0, clusters, n)] + spread * rng.normal(size=(n, dim)).astype(np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    return sample(rows, 0.6), sample(queries, 0.7)
+
+
+def exact_top_k(data: np.ndarray, queries: np.ndarray, k: int, block: int = 65536) -> List[set]:
+    """Ground truth: exact cosine top-k ids, scanning the data in blocks."""
+    best_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+    best_ids = np.zeros((len(queries), k), dtype=np.int64)
+
+    for start in range(0, len(data), block):
+        scores = queries @ data[start:start + block].T
+        ids = np.arange(start, start + scores.shape[1])[None, :].repeat(len(queries), axis=0)
+        scores = np.concatenate([best_scores, scores], axis=1)
+        ids = np.concatenate([best_ids, ids], axis=1)
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        best_scores = np.take_along_axis(scores, top, axis=1)
+        best_ids = np.take_along_axis(ids, top, axis=1)
+
+    return [set(row.tolist()) for row in best_ids]
+
+
+def build_collection(client: MilvusClient, name: str, data: np.ndarray, profile: IndexProfile, batch: int) -> Tuple[float, float]:
+    """Create, fill and index a collection. Returns (insert seconds, index build + load seconds)."""
+    if client.has_collection(name):
+        client.drop_collection(name)
+
+    schema = MilvusClient.create_schema(auto_id=False, enable_dynamic_field=True)
+    schema.add_field("id", DataType.VARCHAR, is_primary=True, max_length=255)
+    schema.add_field("vector", DataType.FLOAT_VECTOR, dim=data.shape[1])
+    client.create_collection(collection_name=name, schema=schema)
+
+    started = time.perf_counter()
+    for start in range(0, len(data), batch):
+        rows = [
+            {"id": str(i), "vector": data[i].tolist()}
+            for i in range(start, min(start + batch, len(data)))
+        ]
+        client.insert(collection_name=name, data=rows)
+    client.flush(name)
+    inserted = time.perf_counter() - started
+
+    started = time.perf_counter()
+    client.create_index(name, EmbeddingService.build_index_params(profile))
+    client.load_collection(name)
+    return inserted, time.perf_counter() - started
+
+
+def run_queries(client: MilvusClient, name: str, queries: np.ndarray, truth: List[set], k: int, search_params: dict) -> dict:
+    latencies = []
+    hits = 0
+    for query, expected in zip(queries, truth):
+        started = time.perf_counter()
+        result = client.search(
+            collection_name=name,
+            data=[query.tolist()],
+            limit=k,
+            search_params=search_params,
+            consistency_level="Strong"
+        )
+        latencies.append(time.perf_counter() - started)
+        hits += len({int(hit["id"]) for hit in result[0]} & expected)
+
+    latencies = np.array(latencies) * 1000
+    return {
+        "recall": hits / (len(queries) * k),
+        "p50": float(np.percentile(latencies, 50)),
+        "p95": float(np.percentile(latencies, 95)),
+        "qps": len(queries) / (latencies.sum() / 1000)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default="./bench_milvus.db")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--clusters", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--batch", type=int, default=2000)
+    parser.add_argument("--index", action="append", default=None,
+                        help=f"TYPE[:key=value,...], types: {', '.join(INDEX_TYPES)} (repeatable)")
+    parser.add_argument("--sweep", action="append", default=None,
+                        help="search param values, e.g. ef=16,64,256 (repeatable)")
+    parser.add_argument("--keep", action="store_true", help="keep the benchmark collections")
+    args = parser.parse_args()
+
+    profiles = [parse_index(spec) for spec in (args.index or ["FLAT", "HNSW", "IVF_FLAT:nlist=1024"])]
+    sweep = parse_sweep(args.sweep or ["ef=16,32,64,128,256", "nprobe=4,8,16,32,64", "search_list=50,100,200"])
+    for profile in profiles:
+        profile.validate_dimension(args.dim)
+
+    print(f"Generating {args.rows} x {args.dim} vectors, {args.queries} queries...")
+    data, queries = make_vectors(args.rows, args.queries, args.dim, args.clusters)
+    started = time.perf_counter()
+    truth = exact_top_k(data, queries, args.top_k)
+    print(f"Exact top-{args.top_k} in {time.perf_counter() - started:.1f}s\n")
+
+    client = MilvusClient(uri=args.uri)
+    print(f"{'index':<32} {'insert':>8} {'build':>8} {'search':<18} {'recall':>7} {'p50 ms':>8} {'p95 ms':>8} {'qps':>8}")
+
+    for profile in profiles:
+        name = COLLECTION_PREFIX + profile.index_type.lower()
+        inserted, built = build_collection(client, name, data, profile, args.batch)
+        label = profile.index_type + "".join(f" {k}={v}" for k, v in profile.build_params.items())
+
+        keys = INDEX_TYPES[profile.index_type]["search_keys"]
+        points = [{key: value} for key, values in sweep.items() if key in keys for value in values] or [{}]
+        for overrides in points:
+            search_params = profile.search_request(overrides, limit=args.top_k)
+            stats = run_queries(client, name, queries, truth, args.top_k, search_params)
+            knob = ",".join(f"{k}={v}" for k, v in search_params["params"].items()) or "-"
+            print(
+                f"{label:<32} {inserted:>7.1f}s {built:>7.1f}s {knob:<18} {stats['recall']:>7.3f} "
+                f"{stats['p50']:>8.2f} {stats['p95']:>8.2f} {stats['qps']:>8.0f}"
+            )
+
+        if not args.keep:
+            client.drop_collection(name)
+
+
+if __name__ == "__main__":
+    main()
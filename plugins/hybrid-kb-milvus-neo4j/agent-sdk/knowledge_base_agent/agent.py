@@ -4,6 +4,10 @@ Knowledge Base Agent - Main Subagent Class
 Agente self-contained que pode ser usado como subagente em qualquer sistema.
 """
 
+import io
+import asyncio
+import heapq
+import itertools
 import anthropic
 from typing import Optional, List, Any, Dict, Union
 from uuid import UUID
@@ -11,15 +15,17 @@ import uuid
 import json
 import logging
 import hashlib
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from .core.config import KBConfig, get_config
+from .core.executors import BackendExecutors, get_executors
 from .core.models import (
     DatabaseManager, get_db, User, KnowledgeBase, KBFile, KBChunk,
     KBVisibility, FileStatus, FileType
 )
 from .storage import StorageManager
-from .processing import FileProcessor, EmbeddingService, GraphService
+from .processing import FileProcessor, EmbeddingService, GraphService, IngestionWorker, IndexProfile
+from .processing.index_profiles import CONSISTENCY_LEVELS
 
 logger = logging.getLogger(__name__)
 
@@ -123,6 +129,19 @@ KB_TOOL_DEFINITIONS = [
             "required": ["file_id", "user_id"]
         }
     },
+    {
+        "name": "kb_replace_file",
+        "description": "Replace a file with a revised version. Only chunks whose content changed are re-embedded and re-indexed.",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "file_id": {"type": "string", "description": "File ID to replace"},
+                "content_base64": {"type": "string", "description": "New file content as base64 string"},
+                "user_id": {"type": "string", "description": "User ID"}
+            },
+            "required": ["file_id", "content_base64", "user_id"]
+        }
+    },
     {
         "name": "kb_search",
         "description": "Search across knowledge bases using semantic, graph, or hybrid search. Returns relevant chunks with scores.",
@@ -212,6 +231,7 @@ class KnowledgeBaseAgent:
         self._processor: Optional[FileProcessor] = None
         self._embeddings: Optional[EmbeddingService] = None
         self._graph: Optional[GraphService] = None
+        self._executors: Optional[BackendExecutors] = None
 
         if auto_init:
             self.initialize()
@@ -236,6 +256,9 @@ class KnowledgeBaseAgent:
             self._db = get_db()
             self._db.initialize()
 
+            # Thread pools for blocking SDK calls
+            self._executors = get_executors(self.config)
+
             # Initialize storage
             self._storage = StorageManager(self.config)
 
@@ -303,11 +326,33 @@ class KnowledgeBaseAgent:
         visibility: str = "private",
         embedding_provider: str = "google",
         tags: List[str] = None,
-        metadata: dict = None
+        metadata: dict = None,
+        index_type: str = None,
+        index_params: dict = None,
+        search_params: dict = None
     ) -> dict:
-        """Create a new knowledge base."""
+        """
+        Create a new knowledge base.
+
+        `index_type` (AUTOINDEX, HNSW, IVF_FLAT, IVF_SQ8, IVF_PQ, DISKANN, FLAT)
+        with its build `index_params` and default `search_params` select the
+        Milvus index; unset values come from the config defaults.
+
+        With `milvus_collection_mode = "shared"`, the KB's vectors go to its
+        provider's shared collection instead, which has a single index (the
+        config defaults).
+        """
         self._ensure_initialized()
 
+        shared = self.config.milvus_collection_mode == "shared"
+        if index_type is None:
+            index_type = self.config.default_index_type
+            index_params = index_params or self.config.default_index_params
+            search_params = search_params or self.config.default_search_params
+        index = IndexProfile.create(index_type, index_params, search_params)
+        if shared and index != self._embeddings.shared_index_profile():
+            raise ValueError("Knowledge bases in a shared Milvus collection use the collection's index profile")
+
         user = self._get_or_create_user(user_id)
         session = self._db.get_session()
 
@@ -320,6 +365,10 @@ class KnowledgeBaseAgent:
                 embedding_provider=embedding_provider,
                 chunk_size=self.config.default_chunk_size,
                 chunk_overlap=self.config.default_chunk_overlap,
+                chunk_unit=self.config.default_chunk_unit,
+                index_type=index.index_type,
+                index_params=index.build_params,
+                search_params=index.search_params,
                 tags=tags or [],
                 metadata=metadata or {}
             )
@@ -329,11 +378,15 @@ class KnowledgeBaseAgent:
             session.flush()  # Get the ID
             kb.milvus_collection = KnowledgeBase.generate_collection_name(kb.id)
 
-            # Create Milvus collection
-            await self._embeddings.create_collection(
-                kb.milvus_collection,
-                kb.embedding_provider
-            )
+            # Create Milvus collection (or use the provider's shared one)
+            if shared:
+                kb.shared_collection = await self._embeddings.ensure_shared_collection(kb.embedding_provider)
+            else:
+                await self._embeddings.create_collection(
+                    kb.milvus_collection,
+                    kb.embedding_provider,
+                    index
+                )
 
             session.commit()
             session.refresh(kb)
@@ -345,8 +398,10 @@ class KnowledgeBaseAgent:
                 "name": kb.name,
                 "description": kb.description,
                 "visibility": kb.visibility.value,
-                "milvus_collection": kb.milvus_collection,
+                "milvus_collection": kb.vector_collection,
+                "shared_collection": kb.shared_collection is not None,
                 "embedding_provider": kb.embedding_provider,
+                **index.as_dict(),
                 "created_at": kb.created_at.isoformat()
             }
         except Exception as e:
@@ -383,12 +438,63 @@ class KnowledgeBaseAgent:
                 "file_count": kb.file_count,
                 "chunk_count": kb.chunk_count,
                 "total_size_bytes": kb.total_size_bytes,
+                "index_type": kb.index_type,
                 "is_owner": kb.owner_id == user.id,
                 "created_at": kb.created_at.isoformat()
             } for kb in kbs]
         finally:
             session.close()
 
+    async def reindex_knowledge_base(
+        self,
+        kb_id: str,
+        user_id: str,
+        index_type: str,
+        index_params: dict = None,
+        search_params: dict = None
+    ) -> dict:
+        """
+        Rebuild a knowledge base's Milvus index with a new profile (owner only).
+
+        Vector search on the KB is unavailable while the index builds.
+        """
+        self._ensure_initialized()
+
+        index = IndexProfile.create(index_type, index_params, search_params)
+        user = self._get_or_create_user(user_id)
+        session = self._db.get_session()
+
+        try:
+            kb = session.query(KnowledgeBase).filter(
+                KnowledgeBase.id == UUID(kb_id),
+                KnowledgeBase.owner_id == user.id
+            ).first()
+
+            if not kb:
+                return {"success": False, "error": "Knowledge base not found or access denied"}
+            if kb.shared_collection:
+                return {
+                    "success": False,
+                    "error": f"Knowledge base uses the shared collection {kb.shared_collection}, indexed as a whole"
+                }
+
+            index.validate_dimension(self._embeddings.DIMENSIONS[kb.embedding_provider])
+            previous = IndexProfile.from_kb(kb)
+            await self._embeddings.reindex(kb.milvus_collection, index)
+
+            kb.index_type = index.index_type
+            kb.index_params = index.build_params
+            kb.search_params = index.search_params
+            session.commit()
+
+            return {"success": True, "kb_id": kb_id, "previous": previous.as_dict(), **index.as_dict()}
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Failed to reindex KB {kb_id}: {e}")
+            raise
+        finally:
+            session.close()
+
     async def delete_knowledge_base(
         self,
         kb_id: str,
@@ -411,9 +517,12 @@ class KnowledgeBaseAgent:
 
             # Delete from Milvus
             try:
-                await self._embeddings.delete_collection(kb.milvus_collection)
+                if kb.shared_collection:
+                    await self._embeddings.delete_kb_vectors(kb.shared_collection, str(kb.id))
+                else:
+                    await self._embeddings.delete_collection(kb.milvus_collection)
             except Exception as e:
-                logger.warning(f"Failed to delete Milvus collection: {e}")
+                logger.warning(f"Failed to delete Milvus vectors: {e}")
 
             # Delete from Neo4j
             try:
@@ -423,7 +532,7 @@ class KnowledgeBaseAgent:
 
             # Delete files from Minio
             try:
-                self._storage.delete_kb_files(str(user.id), str(kb.id))
+                await self._executors.run("minio", self._storage.delete_kb_files, str(user.id), str(kb.id))
             except Exception as e:
                 logger.warning(f"Failed to delete Minio files: {e}")
 
@@ -493,7 +602,7 @@ class KnowledgeBaseAgent:
             object_key = self._storage.generate_object_key(
                 str(user.id), str(kb.id), str(file.id), filename
             )
-            self._storage.upload_file(object_key, content)
+            await self._executors.run("minio", self._storage.upload_file, object_key, content)
             file.minio_object_key = object_key
 
             session.commit()
@@ -521,6 +630,31 @@ class KnowledgeBaseAgent:
         finally:
             session.close()
 
+    async def process_files(
+        self,
+        file_ids: List[str],
+        concurrency: int = None
+    ) -> dict:
+        """Process several uploaded files concurrently and report throughput."""
+        self._ensure_initialized()
+        return await self._processor.process_files(file_ids, concurrency)
+
+    def create_ingestion_worker(
+        self,
+        concurrency: int = None,
+        poll_interval: float = None
+    ) -> IngestionWorker:
+        """
+        Create a long-running worker that processes PENDING files.
+
+        Run it with `await worker.run()` and stop it with `worker.stop()`.
+        Pair with `upload_file(..., process_immediately=False)` for bulk loads;
+        files uploaded through `get_upload_url` are picked up once their
+        upload completes.
+        """
+        self._ensure_initialized()
+        return IngestionWorker(self._processor, self._db, concurrency, poll_interval)
+
     async def get_upload_url(
         self,
         kb_id: str,
@@ -567,7 +701,8 @@ class KnowledgeBaseAgent:
             )
             file.minio_object_key = object_key
 
-            upload_url = self._storage.get_presigned_upload_url(object_key)
+            expires_in = self.config.upload_url_expiry_seconds
+            upload_url = self._storage.get_presigned_upload_url(object_key, timedelta(seconds=expires_in))
 
             session.commit()
 
@@ -577,7 +712,7 @@ class KnowledgeBaseAgent:
                 "upload_url": upload_url,
                 "upload_method": "PUT",
                 "minio_object_key": object_key,
-                "expires_in_seconds": 3600
+                "expires_in_seconds": expires_in
             }
 
         except Exception as e:
@@ -656,14 +791,14 @@ class KnowledgeBaseAgent:
             # Delete vectors from Milvus
             chunk_ids = [str(c.milvus_id) for c in file.chunks if c.milvus_id]
             if chunk_ids:
-                await self._embeddings.delete_vectors(kb.milvus_collection, chunk_ids)
+                await self._embeddings.delete_vectors(kb.vector_collection, chunk_ids, kb_id=kb.partition_key)
 
             # Delete nodes from Neo4j
             await self._graph.delete_file_nodes(str(file.id))
 
             # Delete from Minio
             if file.minio_object_key:
-                self._storage.delete_file(file.minio_object_key)
+                await self._executors.run("minio", self._storage.delete_file, file.minio_object_key)
 
             # Update KB stats
             kb.file_count = max(0, kb.file_count - 1)
@@ -683,6 +818,61 @@ class KnowledgeBaseAgent:
         finally:
             session.close()
 
+    async def replace_file(
+        self,
+        file_id: str,
+        user_id: str,
+        content: bytes
+    ) -> dict:
+        """
+        Replace a file's content with a revised version.
+
+        Only chunks that changed are embedded, upserted or deleted; unchanged
+        chunks keep their vectors and graph nodes.
+
+        The new content is stored under a new object key, which the file
+        points at only once the replacement succeeded; until then (and if it
+        fails) the stored object still matches the indexed chunks.
+        """
+        self._ensure_initialized()
+
+        user = self._get_or_create_user(user_id)
+        session = self._db.get_session()
+
+        try:
+            file = session.query(KBFile).join(KnowledgeBase).filter(
+                KBFile.id == UUID(file_id),
+                (KnowledgeBase.owner_id == user.id) |
+                (KnowledgeBase.visibility == KBVisibility.GLOBAL)
+            ).first()
+
+            if not file:
+                return {"success": False, "error": "File not found or access denied"}
+            if file.file_type == FileType.ZIP:
+                return {"success": False, "error": "ZIP files cannot be replaced in place"}
+
+            old_key = file.minio_object_key
+            new_key = None
+            if old_key:
+                new_key = self._storage.revision_object_key(old_key)
+                await self._executors.run("minio", self._storage.upload_file, new_key, content)
+        finally:
+            session.close()
+
+        result = await self._processor.replace_file(
+            file_id, io.BytesIO(content), size_bytes=len(content), object_key=new_key
+        )
+
+        # Remove the version the file no longer points at
+        stale = old_key if result.get("success") else new_key
+        if stale:
+            try:
+                await self._executors.run("minio", self._storage.delete_file, stale)
+            except Exception as e:
+                logger.warning(f"Failed to delete replaced object {stale}: {e}")
+
+        return result
+
     # =========================================================================
     # SEARCH
     # =========================================================================
@@ -693,11 +883,28 @@ class KnowledgeBaseAgent:
         user_id: str,
         kb_ids: List[str] = None,
         top_k: int = 10,
-        search_type: str = "hybrid"
+        search_type: str = "hybrid",
+        search_params: dict = None,
+        consistency_level: str = None,
+        timeout: float = None
     ) -> dict:
-        """Search across knowledge bases."""
+        """
+        Search across knowledge bases.
+
+        `search_params` (ef, nprobe, search_list) override each KB's index
+        defaults where they apply; `consistency_level` overrides Milvus'.
+        KBs in a shared collection are searched with one Milvus request.
+
+        The query is embedded once per embedding provider, and the vector and
+        graph searches of all KBs run concurrently. Searches still running
+        after `timeout` seconds (default: search_timeout_seconds) are dropped;
+        their KBs are listed in `timed_out`.
+        """
         self._ensure_initialized()
 
+        if consistency_level and consistency_level not in CONSISTENCY_LEVELS:
+            raise ValueError(f"Unknown consistency level: {consistency_level}")
+
         user = self._get_or_create_user(user_id)
         session = self._db.get_session()
 
@@ -716,49 +923,124 @@ class KnowledgeBaseAgent:
             if not kbs:
                 return {"query": query, "results": [], "total": 0}
 
-            all_results = []
-
-            for kb in kbs:
-                if search_type in ["vector", "hybrid"]:
-                    # Vector search
-                    vector_results = await self._embeddings.search(
-                        kb.milvus_collection,
-                        query,
-                        kb.embedding_provider,
-                        top_k
-                    )
-                    for r in vector_results:
-                        r["kb_id"] = str(kb.id)
-                        r["kb_name"] = kb.name
-                    all_results.extend(vector_results)
-
-                if search_type in ["graph", "hybrid"]:
-                    # Graph search
-                    graph_results = await self._graph.search(
-                        query,
-                        str(kb.id),
-                        top_k
-                    )
-                    for r in graph_results:
-                        r["kb_id"] = str(kb.id)
-                        r["kb_name"] = kb.name
-                        r["source"] = "graph"
-                    all_results.extend(graph_results)
-
-            # Sort by score and limit
-            all_results.sort(key=lambda x: x.get("score", 0), reverse=True)
-            all_results = all_results[:top_k]
+            # One task per search leg -> the KB IDs it covers
+            legs: Dict[asyncio.Task, List[str]] = {}
+            query_embeddings = {}
+
+            if search_type in ["vector", "hybrid"]:
+                # Each provider's query embedding is shared by its KBs' searches
+                query_embeddings = {
+                    provider: asyncio.ensure_future(self._embeddings.generate_query_embedding(query, provider))
+                    for provider in {kb.embedding_provider for kb in kbs}
+                }
+                for collection, group, shared_ids in self._vector_requests(kbs):
+                    task = asyncio.ensure_future(self._vector_search(
+                        collection, group, shared_ids, query, query_embeddings[group[0].embedding_provider],
+                        top_k, search_params, consistency_level
+                    ))
+                    legs[task] = [str(kb.id) for kb in group]
+
+            if search_type in ["graph", "hybrid"]:
+                for kb in kbs:
+                    legs[asyncio.ensure_future(self._graph_search(kb, query, top_k))] = [str(kb.id)]
+
+            if legs:
+                done, pending = await asyncio.wait(
+                    legs, timeout=timeout if timeout is not None else self.config.search_timeout_seconds
+                )
+            else:
+                done, pending = set(), set()
+            for future in [*pending, *query_embeddings.values()]:
+                future.cancel()
+
+            timed_out = sorted({kb_id for task in pending for kb_id in legs[task]})
+            if timed_out:
+                logger.warning(f"Search deadline hit; dropped results of {len(timed_out)} knowledge bases")
+
+            leg_results = []
+            for task in done:
+                if task.exception() is not None:
+                    logger.warning(f"Search failed for KBs {legs[task]}: {task.exception()}")
+                else:
+                    leg_results.append(task.result())
+
+            # Top-k by score over all legs (bounded heap)
+            all_results = heapq.nlargest(
+                top_k,
+                itertools.chain.from_iterable(leg_results),
+                key=lambda x: x.get("score", 0)
+            )
 
             return {
                 "query": query,
                 "results": all_results,
                 "total": len(all_results),
-                "search_type": search_type
+                "search_type": search_type,
+                "timed_out": timed_out
             }
 
         finally:
             session.close()
 
+    @staticmethod
+    def _vector_requests(kbs: List[KnowledgeBase]) -> List[tuple]:
+        """
+        Milvus searches needed for these KBs, as (collection, KBs, kb_id filter):
+        one per per-KB collection, and one per shared collection for all of its
+        KBs.
+        """
+        requests = []
+        shared: Dict[str, List[KnowledgeBase]] = {}
+        for kb in kbs:
+            if kb.shared_collection:
+                shared.setdefault(kb.shared_collection, []).append(kb)
+            else:
+                requests.append((kb.milvus_collection, [kb], None))
+        for collection, group in shared.items():
+            requests.append((collection, group, [str(kb.id) for kb in group]))
+        return requests
+
+    async def _vector_search(
+        self,
+        collection: str,
+        kbs: List[KnowledgeBase],
+        shared_ids: Optional[List[str]],
+        query: str,
+        query_embedding: asyncio.Future,
+        top_k: int,
+        search_params: dict = None,
+        consistency_level: str = None
+    ) -> List[dict]:
+        """Vector search leg for one collection, using the provider's shared query embedding."""
+        # Shielded: a leg dropped at the deadline must not cancel the embedding other legs await
+        vector = await asyncio.shield(query_embedding)
+        hits = await self._embeddings.search(
+            collection,
+            query,
+            kbs[0].embedding_provider,
+            top_k,
+            index=IndexProfile.from_kb(kbs[0]),
+            search_params=search_params,
+            consistency_level=consistency_level,
+            kb_ids=shared_ids,
+            query_embedding=vector
+        )
+
+        names = {str(kb.id): kb.name for kb in kbs}
+        for r in hits:
+            r["kb_id"] = r["kb_id"] if shared_ids else str(kbs[0].id)
+            r["kb_name"] = names.get(r["kb_id"])
+        return hits
+
+    async def _graph_search(self, kb: KnowledgeBase, query: str, top_k: int) -> List[dict]:
+        """Graph search leg for one KB."""
+        results = await self._graph.search(query, str(kb.id), top_k)
+        for r in results:
+            r["kb_id"] = str(kb.id)
+            r["kb_name"] = kb.name
+            r["source"] = "graph"
+        return results
+
     # =========================================================================
     # HEALTH CHECK
     # =========================================================================
@@ -814,6 +1096,11 @@ class KnowledgeBaseAgent:
                 file_id=i["file_id"],
                 user_id=i["user_id"]
             ),
+            "kb_replace_file": lambda i: self._replace_from_base64(
+                file_id=i["file_id"],
+                user_id=i["user_id"],
+                content_base64=i["content_base64"]
+            ),
             "kb_search": lambda i: self.search(
                 query=i["query"],
                 user_id=i["user_id"],
@@ -851,6 +1138,17 @@ class KnowledgeBaseAgent:
         content = base64.b64decode(content_base64)
         return await self.upload_file(kb_id, user_id, filename, content)
 
+    async def _replace_from_base64(
+        self,
+        file_id: str,
+        user_id: str,
+        content_base64: str
+    ) -> dict:
+        """Replace file content from base64."""
+        import base64
+        content = base64.b64decode(content_base64)
+        return await self.replace_file(file_id, user_id, content)
+
     # =========================================================================
     # NATURAL LANGUAGE INTERFACE (subagent mode)
     # =========================================================================
@@ -872,6 +1170,7 @@ You have access to the following tools:
 - kb_upload_file: Upload a file (base64)
 - kb_list_files: List files in a KB
 - kb_delete_file: Delete a file
+- kb_replace_file: Replace a file with a revised version (base64)
 - kb_search: Search across knowledge bases
 - kb_get_upload_url: Get presigned upload URL
 - kb_health: Check system health
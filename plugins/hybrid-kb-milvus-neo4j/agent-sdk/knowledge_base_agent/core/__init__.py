@@ -1,6 +1,7 @@
 """Core module - Configuration and Models."""
 
 from .config import KBConfig, get_config
+from .executors import BackendExecutors, get_executors, run_blocking
 from .models import (
     DatabaseManager,
     get_db,
@@ -8,21 +9,28 @@ from .models import (
     KnowledgeBase,
     KBFile,
     KBChunk,
+    IngestionJob,
     KBVisibility,
     FileStatus,
-    FileType
+    FileType,
+    JobStatus
 )
 
 __all__ = [
     "KBConfig",
     "get_config",
+    "BackendExecutors",
+    "get_executors",
+    "run_blocking",
     "DatabaseManager",
     "get_db",
     "User",
     "KnowledgeBase",
     "KBFile",
     "KBChunk",
+    "IngestionJob",
     "KBVisibility",
     "FileStatus",
-    "FileType"
+    "FileType",
+    "JobStatus"
 ]
@@ -7,7 +7,7 @@ Gerencia conexões e auto-inicialização de toda a infraestrutura.
 import os
 import logging
 from dataclasses import dataclass, field
-from typing import Optional
+from typing import Dict, Optional
 from functools import lru_cache
 
 logger = logging.getLogger(__name__)
@@ -66,7 +66,7 @@ class KBConfig:
         default_factory=lambda: os.getenv("KB_MINIO_BUCKET", "knowledge-base")
     )
 
-    # Redis (optional, for caching)
+    # Redis (optional, for embedding cache)
     redis_url: str = field(
         default_factory=lambda: os.getenv("KB_REDIS_URL", os.getenv("REDIS_URL", "redis://localhost:6379"))
     )
@@ -93,7 +93,97 @@ class KBConfig:
     # Processing
     default_chunk_size: int = 512
     default_chunk_overlap: int = 50
+    default_chunk_unit: str = "chars"  # chunk_size/overlap in "chars" or "tokens"
+
+    # Milvus vector index for new knowledge bases (see processing.index_profiles)
+    default_index_type: str = "AUTOINDEX"  # or HNSW, IVF_FLAT, IVF_SQ8, IVF_PQ, DISKANN, FLAT
+    default_index_params: Dict[str, int] = field(default_factory=dict)  # e.g. {"M": 16, "efConstruction": 200}
+    default_search_params: Dict[str, int] = field(default_factory=dict)  # e.g. {"ef": 64}
+
+    # Milvus collection layout for new knowledge bases: "per_kb" (one collection each) or
+    # "shared" (one collection per embedding provider, KBs isolated by a kb_id partition key)
+    milvus_collection_mode: str = field(
+        default_factory=lambda: os.getenv("KB_MILVUS_COLLECTION_MODE", "per_kb")
+    )
+    milvus_shared_collection: str = "kb_shared"  # prefix, suffixed with the provider (kb_shared_google)
+    milvus_partition_count: int = 64  # partition key buckets in a shared collection
+    milvus_migration_batch: int = 1000  # rows per batch when moving a KB into a shared collection
+
+    # Search (vector and graph legs of all KBs run concurrently)
+    search_timeout_seconds: float = 10.0  # per-search deadline; legs still running are dropped
+
     max_file_size_mb: int = 100
+    spool_max_memory_mb: int = 16  # larger downloads are spooled to disk
+    zip_max_members: int = 10000
+    zip_max_uncompressed_mb: int = 10240
+    zip_member_concurrency: int = 4
+
+    # Embedding batching (capped by each provider's own request limits)
+    embedding_batch_size: int = 96
+    embedding_batch_max_tokens: int = 16000
+    embedding_concurrency: int = 4  # initial concurrent requests per provider (adapts, see below)
+    dedup_embeddings: bool = True  # reuse vectors of identical chunks in the same KB
+
+    # Embedding rate control (per provider: AIMD concurrency, quotas, retries)
+    embedding_max_concurrency: int = 32  # capped at embedding_threads
+    embedding_rate_limits: Dict[str, Dict[str, int]] = field(
+        default_factory=dict
+    )  # e.g. {"google": {"requests_per_minute": 1500, "tokens_per_minute": 1000000}}; unset = unlimited
+    embedding_max_retries: int = 5
+    embedding_backoff_base: float = 0.5  # seconds, doubled per retry (full jitter)
+    embedding_backoff_max: float = 30.0
+
+    # Embedding cache (in-process LRU + Redis at redis_url)
+    embedding_cache_enabled: bool = True
+    embedding_cache_size: int = 20000  # LRU entries
+    embedding_cache_ttl: int = 7 * 24 * 3600  # Redis TTL in seconds
+    embedding_cache_redis: bool = field(
+        default_factory=lambda: os.getenv("KB_EMBEDDING_CACHE_REDIS", "true").lower() == "true"
+    )
+    embedding_cache_timeout: float = 1.0  # Redis connect/read timeout in seconds; a slow Redis counts as a miss
+
+    # Milvus writes (batched by rows and payload size, shared across files)
+    milvus_batch_rows: int = 1000
+    milvus_batch_max_mb: int = 16  # well under Milvus' default 64 MB gRPC limit
+    milvus_write_concurrency: int = 4  # requests in flight
+    milvus_write_linger_ms: int = 20  # wait for other files to fill a batch
+
+    # Thread pools for blocking SDK calls, one per backend
+    embedding_threads: int = 8
+    milvus_threads: int = 8
+    neo4j_threads: int = 8
+    minio_threads: int = 8
+    extract_threads: int = 4  # text extraction, chunking and spooling
+    cache_threads: int = 4  # embedding cache lookups (Redis)
+
+    # Text extraction ("process": heavy formats run in worker processes; "thread": inline)
+    extraction_mode: str = "process"
+    extraction_processes: int = 0  # heavy files extracted at once; 0 = one per CPU core
+    extraction_memory_mb: int = 2048  # address-space cap per worker process
+    extraction_tasks_per_worker: int = 50  # recycle workers after N files
+    extraction_timeouts: Dict[str, float] = field(default_factory=dict)  # seconds, per file type
+
+    # Ingestion workers
+    ingestion_concurrency: int = 4
+    ingestion_poll_interval: float = 5.0
+    ingestion_batch_chunks: int = 256  # chunks embedded/written per window
+    chunk_insert_batch_size: int = 1000  # KBChunk rows per executemany
+    pipeline_queue_size: int = 4  # chunk windows buffered between stages
+    pipeline_embed_workers: int = 2
+    pipeline_write_workers: int = 2
+
+    # Direct (presigned URL) uploads
+    upload_url_expiry_seconds: int = 3600
+    upload_scan_interval: float = 5.0  # seconds between stat_object scans of awaited uploads (0 = off)
+    upload_scan_batch: int = 500  # object keys checked per scan
+    upload_notifications: bool = field(
+        default_factory=lambda: os.getenv("KB_UPLOAD_NOTIFICATIONS", "false").lower() == "true"
+    )  # also consume Minio bucket notifications
+
+    # Ingestion jobs (leases, checkpoints, reaper)
+    ingestion_lease_seconds: int = 120  # a job is re-queued this long after its last heartbeat
+    ingestion_heartbeat_seconds: int = 30
+    ingestion_job_max_attempts: int = 3  # leases lost before the file is marked FAILED
 
     # Auto-initialization
     auto_init: bool = True
@@ -0,0 +1,123 @@
+"""
+Executors - Bounded Thread Pools per Backend
+=============================================
+Executa chamadas bloqueantes dos SDKs fora do event loop, um pool por backend.
+"""
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+import logging
+
+from .config import KBConfig, get_config
+
+logger = logging.getLogger(__name__)
+
+
+class BackendExecutors:
+    """
+    One bounded thread pool per blocking backend.
+
+    The SDKs used here (genai, cohere, pymilvus, the neo4j sync driver,
+    minio, redis) block the calling thread. Running them on per-backend pools
+    keeps the event loop free, and a slow backend can only exhaust its
+    own pool, not the others (a stuck Neo4j query does not delay Milvus
+    searches).
+
+    Usage:
+        executors = get_executors()
+        rows = await executors.run("milvus", client.search, collection_name=..., data=...)
+    """
+
+    BACKENDS = ("embeddings", "milvus", "neo4j", "minio", "extract", "cache")
+
+    def __init__(self, sizes: Dict[str, int]):
+        self.sizes = {backend: max(1, sizes.get(backend, 4)) for backend in self.BACKENDS}
+        self._pools: Dict[str, ThreadPoolExecutor] = {}
+        self._lock = threading.Lock()
+        self._counters = {backend: {"calls": 0, "in_flight": 0, "max_in_flight": 0} for backend in self.BACKENDS}
+
+    @classmethod
+    def from_config(cls, config: KBConfig) -> "BackendExecutors":
+        return cls({
+            "embeddings": config.embedding_threads,
+            "milvus": config.milvus_threads,
+            "neo4j": config.neo4j_threads,
+            "minio": config.minio_threads,
+            "extract": config.extract_threads,
+            "cache": config.cache_threads
+        })
+
+    def pool(self, backend: str) -> ThreadPoolExecutor:
+        """The pool for `backend`, created on first use."""
+        if backend not in self.sizes:
+            raise ValueError(f"Unknown backend: {backend}")
+
+        pool = self._pools.get(backend)
+        if pool is None:
+            with self._lock:
+                pool = self._pools.get(backend)
+                if pool is None:
+                    pool = ThreadPoolExecutor(
+                        max_workers=self.sizes[backend],
+                        thread_name_prefix=f"kb-{backend}"
+                    )
+                    self._pools[backend] = pool
+        return pool
+
+    async def run(self, backend: str, fn: Callable, *args, **kwargs) -> Any:
+        """Run a blocking call on the backend's pool and await its result."""
+        loop = asyncio.get_running_loop()
+        pool = self.pool(backend)
+        counters = self._counters[backend]
+
+        counters["calls"] += 1
+        counters["in_flight"] += 1
+        counters["max_in_flight"] = max(counters["max_in_flight"], counters["in_flight"])
+        try:
+            return await loop.run_in_executor(pool, functools.partial(fn, *args, **kwargs))
+        finally:
+            counters["in_flight"] -= 1
+
+    def stats(self) -> dict:
+        """Per-backend pool size and call counters (in_flight includes queued calls)."""
+        return {
+            backend: {"max_workers": self.sizes[backend], **self._counters[backend]}
+            for backend in self.BACKENDS
+        }
+
+    def shutdown(self, wait: bool = True):
+        """Shut down all pools."""
+        with self._lock:
+            pools, self._pools = self._pools, {}
+        for pool in pools.values():
+            pool.shutdown(wait=wait)
+
+
+_executors: Optional[BackendExecutors] = None
+_executors_lock = threading.Lock()
+
+
+def get_executors(config: KBConfig = None) -> BackendExecutors:
+    """Get the process-wide executors, sized from `config` (or get_config()) on first use."""
+    global _executors
+    if _executors is None:
+        with _executors_lock:
+            if _executors is None:
+                _executors = BackendExecutors.from_config(config or get_config())
+    return _executors
+
+
+def run_blocking(backend: str):
+    """
+    Decorator turning a blocking method into a coroutine that runs on the
+    backend's thread pool.
+    """
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            return await get_executors().run(backend, fn, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -12,7 +12,7 @@ import logging
 
 from sqlalchemy import (
     create_engine, Column, String, Text, Boolean, DateTime, Integer,
-    ForeignKey, Enum as SQLEnum, JSON, BigInteger, Index
+    ForeignKey, Enum as SQLEnum, JSON, BigInteger, Index, inspect, text
 )
 from sqlalchemy.dialects.postgresql import UUID, ARRAY
 from sqlalchemy.ext.declarative import declarative_base
@@ -44,6 +44,14 @@ class FileStatus(str, Enum):
     FAILED = "failed"
 
 
+class JobStatus(str, Enum):
+    """Status of an ingestion job."""
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
 class FileType(str, Enum):
     """Supported file types."""
     PDF = "pdf"
@@ -94,9 +102,16 @@ class KnowledgeBase(Base):
     embedding_provider = Column(String(50), default="google")
     chunk_size = Column(Integer, default=512)
     chunk_overlap = Column(Integer, default=50)
+    chunk_unit = Column(String(10), default="chars")  # "chars" or "tokens"
 
     # Storage references
     milvus_collection = Column(String(255), unique=True)
+    shared_collection = Column(String(255))  # set when vectors live in a shared, kb_id-partitioned collection
+
+    # Vector index (see processing.index_profiles)
+    index_type = Column(String(32), default="AUTOINDEX")
+    index_params = Column(JSON, default={})  # build params, e.g. {"M": 16, "efConstruction": 200}
+    search_params = Column(JSON, default={})  # default search params, e.g. {"ef": 64}
 
     # Statistics (updated on file changes)
     file_count = Column(Integer, default=0)
@@ -121,6 +136,16 @@ class KnowledgeBase(Base):
     def __repr__(self):
         return f"<KnowledgeBase {self.name}>"
 
+    @property
+    def vector_collection(self) -> str:
+        """Milvus collection holding this KB's vectors."""
+        return self.shared_collection or self.milvus_collection
+
+    @property
+    def partition_key(self) -> Optional[str]:
+        """kb_id to filter on in a shared collection (None for a per-KB collection)."""
+        return str(self.id) if self.shared_collection else None
+
     @staticmethod
     def generate_collection_name(kb_id: uuid.UUID) -> str:
         """Generate a valid Milvus collection name."""
@@ -182,11 +207,15 @@ class KBChunk(Base):
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     file_id = Column(UUID(as_uuid=True), ForeignKey("kb_files.id", ondelete="CASCADE"), nullable=False)
+    knowledge_base_id = Column(UUID(as_uuid=True), ForeignKey("kb_knowledge_bases.id", ondelete="CASCADE"))
 
     # Chunk info
     chunk_index = Column(Integer, nullable=False)
     content = Column(Text, nullable=False)
     content_hash = Column(String(64))
+    embedding_provider = Column(String(50))  # for embedding reuse by content_hash
+    start_offset = Column(Integer)  # character offsets in the extracted text
+    end_offset = Column(Integer)
 
     # Vector reference
     milvus_id = Column(String(255))
@@ -204,9 +233,49 @@ class KBChunk(Base):
     __table_args__ = (
         Index("ix_chunk_file", "file_id"),
         Index("ix_chunk_milvus", "milvus_id"),
+        Index("ix_chunk_kb_provider_hash", "knowledge_base_id", "embedding_provider", "content_hash"),
     )
 
 
+class IngestionJob(Base):
+    """
+    Durable ingestion job for a file, leased by one worker at a time.
+
+    The worker renews `lease_expires_at` while it runs; a job whose lease
+    expired (worker died) is re-queued by the reaper. `checkpoint_chunks`
+    counts the leading chunks already embedded and committed, so a resumed
+    job continues after them.
+    """
+    __tablename__ = "kb_ingestion_jobs"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    file_id = Column(UUID(as_uuid=True), ForeignKey("kb_files.id", ondelete="CASCADE"), nullable=False, unique=True)
+
+    status = Column(SQLEnum(JobStatus), default=JobStatus.QUEUED, nullable=False)
+    attempts = Column(Integer, default=0)
+    last_error = Column(Text)
+
+    # Lease
+    worker_id = Column(String(255))
+    lease_expires_at = Column(DateTime(timezone=True))
+    heartbeat_at = Column(DateTime(timezone=True))
+
+    # Checkpoint
+    checkpoint_chunks = Column(Integer, default=0)  # chunks [0, n) are committed
+    checkpoint_offset = Column(Integer, default=0)  # end offset of chunk n-1
+    checkpoint_key = Column(String(255))  # chunking settings the checkpoint was made with
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    __table_args__ = (
+        Index("ix_job_status_lease", "status", "lease_expires_at"),
+    )
+
+    def __repr__(self):
+        return f"<IngestionJob {self.file_id} {self.status}>"
+
+
 # ============================================================================
 # DATABASE MANAGER
 # ============================================================================
@@ -226,6 +295,43 @@ class DatabaseManager:
     _instance = None
     _initialized = False
 
+    # Columns added to existing tables since the first release, as
+    # PostgreSQL DDL (create_all creates missing tables, never columns)
+    UPGRADE_COLUMNS = {
+        "kb_knowledge_bases": {
+            "chunk_unit": "VARCHAR(10) DEFAULT 'chars'",
+            "shared_collection": "VARCHAR(255)",
+            "index_type": "VARCHAR(32) DEFAULT 'AUTOINDEX'",
+            "index_params": "JSON DEFAULT '{}'",
+            "search_params": "JSON DEFAULT '{}'",
+        },
+        "kb_chunks": {
+            "knowledge_base_id": "UUID REFERENCES kb_knowledge_bases(id) ON DELETE CASCADE",
+            "embedding_provider": "VARCHAR(50)",
+            "start_offset": "INTEGER",
+            "end_offset": "INTEGER",
+        },
+    }
+
+    # Fill a newly added column of existing rows from other tables
+    UPGRADE_BACKFILLS = {
+        ("kb_chunks", "knowledge_base_id"): """
+            UPDATE kb_chunks c SET knowledge_base_id = f.knowledge_base_id
+            FROM kb_files f
+            WHERE c.file_id = f.id AND c.knowledge_base_id IS NULL
+        """,
+        ("kb_chunks", "embedding_provider"): """
+            UPDATE kb_chunks c SET embedding_provider = k.embedding_provider
+            FROM kb_files f JOIN kb_knowledge_bases k ON k.id = f.knowledge_base_id
+            WHERE c.file_id = f.id AND c.embedding_provider IS NULL
+        """,
+    }
+
+    UPGRADE_INDEXES = [
+        "CREATE INDEX IF NOT EXISTS ix_chunk_kb_provider_hash "
+        "ON kb_chunks (knowledge_base_id, embedding_provider, content_hash)",
+    ]
+
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super().__new__(cls)
@@ -248,7 +354,8 @@ class DatabaseManager:
 
     def initialize(self) -> bool:
         """
-        Create all tables if they don't exist.
+        Create all tables if they don't exist, and upgrade tables created by
+        earlier versions (see upgrade_schema).
         Safe to call multiple times.
         """
         if DatabaseManager._initialized:
@@ -256,6 +363,7 @@ class DatabaseManager:
 
         try:
             Base.metadata.create_all(bind=self._engine)
+            self.upgrade_schema()
             DatabaseManager._initialized = True
             logger.info("Database tables created/verified successfully")
             return True
@@ -263,6 +371,28 @@ class DatabaseManager:
             logger.error(f"Failed to create database tables: {e}")
             raise
 
+    def upgrade_schema(self):
+        """
+        Add the columns and indexes introduced since a table was created,
+        backfilling derived columns. New tables (e.g. kb_ingestion_jobs) are
+        created by create_all. Idempotent.
+        """
+        inspector = inspect(self._engine)
+        with self._engine.begin() as conn:
+            for table, columns in self.UPGRADE_COLUMNS.items():
+                existing = {column["name"] for column in inspector.get_columns(table)}
+                for name, ddl in columns.items():
+                    if name in existing:
+                        continue
+                    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {name} {ddl}"))
+                    backfill = self.UPGRADE_BACKFILLS.get((table, name))
+                    if backfill:
+                        conn.execute(text(backfill))
+                    logger.info(f"Upgraded schema: added {table}.{name}")
+
+            for ddl in self.UPGRADE_INDEXES:
+                conn.execute(text(ddl))
+
     def session(self):
         """Get a database session context manager."""
         return self._SessionLocal()
@@ -3,5 +3,38 @@
 from .file_processor import FileProcessor
 from .embeddings import EmbeddingService
 from .graph import GraphService
+from .worker import IngestionWorker, IngestionStats
+from .cache import EmbeddingCache
+from .chunking import TextChunker, Chunk, TableRows
+from .vector_writer import VectorWriter
+from .pipeline import Pipeline, Stage
+from .jobs import JobStore, JobLease, LeaseLost
+from .uploads import UploadDetector
+from .index_profiles import IndexProfile
+from .collection_migration import CollectionMigrator
+from .extractors import ExtractorRegistry, Extractor, TextExtraction, registry as extractors
 
-__all__ = ["FileProcessor", "EmbeddingService", "GraphService"]
+__all__ = [
+    "FileProcessor",
+    "EmbeddingService",
+    "GraphService",
+    "IngestionWorker",
+    "IngestionStats",
+    "EmbeddingCache",
+    "TextChunker",
+    "Chunk",
+    "TableRows",
+    "VectorWriter",
+    "Pipeline",
+    "Stage",
+    "JobStore",
+    "JobLease",
+    "LeaseLost",
+    "UploadDetector",
+    "IndexProfile",
+    "CollectionMigrator",
+    "ExtractorRegistry",
+    "Extractor",
+    "TextExtraction",
+    "extractors"
+]
@@ -0,0 +1,143 @@
+"""
+Embedding Cache - In-Process LRU + Redis
+=========================================
+Cache de embeddings em dois níveis, compartilhado entre workers via Redis.
+"""
+
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import hashlib
+import logging
+import threading
+
+from ..core.config import KBConfig
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache.
+
+    Tier 1 is a bounded in-process LRU; tier 2 is Redis (optional), shared by
+    all workers. Vectors are stored as packed float32 in both tiers. Keys
+    include provider, model and task type, so document and query embeddings
+    of the same text never collide.
+
+    get_many/set_many block on Redis (bounded by embedding_cache_timeout);
+    async callers run them on the "cache" thread pool.
+    """
+
+    KEY_PREFIX = "kb:emb"
+
+    def __init__(self, config: KBConfig):
+        self.max_entries = config.embedding_cache_size
+        self.ttl = config.embedding_cache_ttl
+        self._lru: "OrderedDict[str, array]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._redis = None
+        self._counters = {"lru_hits": 0, "redis_hits": 0, "misses": 0, "redis_errors": 0}
+
+        if config.embedding_cache_redis:
+            try:
+                import redis
+                self._redis = redis.from_url(
+                    config.redis_url,
+                    socket_connect_timeout=config.embedding_cache_timeout,
+                    socket_timeout=config.embedding_cache_timeout
+                )
+                self._redis.ping()
+            except Exception as e:
+                logger.warning(f"Redis embedding cache unavailable, using in-process cache only: {e}")
+                self._redis = None
+
+    @classmethod
+    def make_key(cls, provider: str, model: str, task_type: str, text: str) -> str:
+        digest = hashlib.sha256(text.encode()).hexdigest()
+        return f"{cls.KEY_PREFIX}:{provider}:{model}:{task_type}:{digest}"
+
+    def get_many(self, keys: List[str]) -> List[Optional[List[float]]]:
+        """Look up keys in the LRU, then Redis. Misses are returned as None."""
+        results: List[Optional[List[float]]] = [None] * len(keys)
+        remote = []
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                packed = self._lru.get(key)
+                if packed is not None:
+                    self._lru.move_to_end(key)
+                    self._counters["lru_hits"] += 1
+                    results[i] = packed.tolist()
+                else:
+                    remote.append(i)
+
+        if remote and self._redis is not None:
+            try:
+                payloads = self._redis.mget([keys[i] for i in remote])
+            except Exception as e:
+                logger.warning(f"Redis embedding cache read failed: {e}")
+                self._counters["redis_errors"] += 1
+                payloads = [None] * len(remote)
+
+            found = {}
+            for i, payload in zip(remote, payloads):
+                if payload is not None:
+                    packed = array('f')
+                    packed.frombytes(payload)
+                    found[keys[i]] = packed
+                    results[i] = packed.tolist()
+
+            if found:
+                with self._lock:
+                    self._counters["redis_hits"] += len(found)
+                    for key, packed in found.items():
+                        self._remember(key, packed)
+
+        with self._lock:
+            self._counters["misses"] += sum(1 for r in results if r is None)
+
+        return results
+
+    def set_many(self, items: Dict[str, List[float]]):
+        """Store vectors in both tiers."""
+        if not items:
+            return
+
+        packed_items = {key: array('f', vector) for key, vector in items.items()}
+
+        with self._lock:
+            for key, packed in packed_items.items():
+                self._remember(key, packed)
+
+        if self._redis is not None:
+            try:
+                pipe = self._redis.pipeline(transaction=False)
+                for key, packed in packed_items.items():
+                    pipe.set(key, packed.tobytes(), ex=self.ttl or None)
+                pipe.execute()
+            except Exception as e:
+                logger.warning(f"Redis embedding cache write failed: {e}")
+                self._counters["redis_errors"] += 1
+
+    def _remember(self, key: str, packed: array):
+        self._lru[key] = packed
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current LRU size."""
+        with self._lock:
+            counters = dict(self._counters)
+            size = len(self._lru)
+
+        lookups = counters["lru_hits"] + counters["redis_hits"] + counters["misses"]
+        hits = counters["lru_hits"] + counters["redis_hits"]
+        return {
+            **counters,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "lru_size": size,
+            "lru_max_entries": self.max_entries,
+            "redis": self._redis is not None
+        }
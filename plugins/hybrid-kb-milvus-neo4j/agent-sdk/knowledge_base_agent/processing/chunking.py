@@ -0,0 +1,263 @@
+"""
+Chunking Engine - Single-Pass Sentence Chunker
+===============================================
+Divide texto em chunks com sobreposição, registrando offsets de caracteres.
+"""
+
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, List, Literal, Optional, Tuple, Union
+import re
+
+# Greedy patterns: matched against a chunk window they find the *last*
+# sentence end / word end inside it in a single C-level scan.
+_LAST_SENTENCE_END = re.compile(r'.*[.!?](?=\s)', re.S)
+_LAST_WORD_END = re.compile(r'.*\S(?=\s)', re.S)
+_NEXT_WORD = re.compile(r'(?<!\S)\S')
+_NON_SPACE = re.compile(r'\S')
+_TOKEN = re.compile(r'\w+|[^\w\s]')
+
+
+def count_tokens(text: str) -> int:
+    """Approximate token count: words and punctuation marks."""
+    return len(_TOKEN.findall(text))
+
+
+@dataclass
+class Chunk:
+    """A chunk of a document and its [start, end) character offsets in it."""
+    index: int
+    text: str
+    start: int
+    end: int
+
+
+@dataclass
+class TableRows:
+    """
+    A group of spreadsheet rows, emitted by table extractors instead of text.
+
+    The chunker packs rows (never splitting one unless it alone exceeds a
+    chunk) and starts every chunk with `header`.
+    """
+    header: str
+    rows: List[str] = field(default_factory=list)
+
+    def text(self) -> str:
+        return "\n".join([self.header, *self.rows]) if self.header else "\n".join(self.rows)
+
+
+Segment = Union[str, TableRows]
+
+
+class _Window:
+    """The part of the document still needed, addressed by absolute offsets."""
+
+    def __init__(self):
+        self.buf = ""
+        self.start = 0
+
+    def append(self, segment: str, keep_from: int):
+        # One copy per segment: drop everything before keep_from, add the segment
+        self.buf = self.buf[keep_from - self.start:] + segment
+        self.start = keep_from
+
+    def text(self, start: int, end: int) -> str:
+        return self.buf[start - self.start:end - self.start]
+
+
+class TextChunker:
+    """
+    Split text into overlapping chunks in one pass over the text.
+
+    Each chunk is the longest run of whole sentences that fits in
+    `chunk_size` characters (unit="chars") or approximate tokens
+    (unit="tokens"); a sentence longer than that is cut between words.
+    Each chunk starts with up to `overlap` units of the previous one, cut on
+    a word boundary. Every chunk records its character offsets in the
+    concatenated input, so `text == source[start:end]`.
+
+    Boundaries are found with precompiled patterns over one chunk window at
+    a time, so the cost is linear in the text size. Works on a whole string
+    (`chunk`) or on a stream of segments such as PDF pages (`iter_chunks`);
+    both give the same chunks, and the streaming case only keeps the current
+    segment and the unfinished chunk in memory.
+
+    `TableRows` segments (spreadsheets) are packed row by row instead: each
+    chunk holds as many whole rows as fit after the repeated header row, and
+    has no overlap. Their offsets refer to the extracted text with the
+    header written at the top of every chunk.
+    """
+
+    # Share of a chunk the repeated table header may take; larger headers are not repeated
+    MAX_HEADER_SHARE = 0.5
+
+    def __init__(
+        self,
+        chunk_size: int = 512,
+        overlap: int = 50,
+        unit: Literal["chars", "tokens"] = "chars"
+    ):
+        if unit not in ("chars", "tokens"):
+            raise ValueError(f"Unknown chunk unit: {unit}")
+
+        self.chunk_size = max(1, chunk_size)
+        self.overlap = max(0, min(overlap, self.chunk_size - 1))
+        self.unit = unit
+
+        # Matches up to chunk_size tokens from a position
+        self._token_window = re.compile(r'(?:\s*(?:\w+|[^\w\s])){1,%d}' % self.chunk_size)
+
+    def chunk(self, text: str) -> List[Chunk]:
+        """Chunk a complete text."""
+        return list(self.iter_chunks([text]))
+
+    def iter_chunks(self, segments: Iterable[Segment]) -> Iterator[Chunk]:
+        """Chunk a stream of text segments, yielding chunks as soon as they are complete."""
+        window = _Window()
+        # pos: where the next chunk starts; min_end: it must extend past this
+        state = {"pos": 0, "min_end": 0, "index": 0}
+        table = None
+
+        for segment in segments:
+            if isinstance(segment, TableRows):
+                if table is None:
+                    yield from self._drain(window, state, final=True)
+                    table = _TablePacker(self, window.start + len(window.buf))
+                yield from table.add(segment, state)
+                continue
+
+            if table is not None:
+                yield from table.flush(state)
+                window = _Window()
+                window.append("", keep_from=table.offset)
+                state["pos"] = state["min_end"] = table.offset
+                table = None
+
+            window.append(segment, keep_from=state["pos"])
+            yield from self._drain(window, state, final=False)
+
+        if table is not None:
+            yield from table.flush(state)
+        else:
+            yield from self._drain(window, state, final=True)
+
+    def measure(self, text: str) -> int:
+        """Size of `text` in the chunker's unit."""
+        return len(text) if self.unit == "chars" else count_tokens(text)
+
+    def _drain(self, window: _Window, state: dict, final: bool) -> Iterator[Chunk]:
+        while True:
+            span = self._next_span(window, state["pos"], state["min_end"], final)
+            if span is None:
+                return
+
+            start, end, limit = span
+            yield Chunk(index=state["index"], text=window.text(start, end), start=start, end=end)
+            state["index"] += 1
+            state["pos"] = self._overlap_start(window, start, end, limit)
+            state["min_end"] = end
+
+    def _next_span(self, window: _Window, pos: int, min_end: int, final: bool) -> Optional[Tuple[int, int, int]]:
+        """
+        The next chunk (start, end, window limit) from `pos`, or None if more
+        text is needed (or there is none).
+        """
+        buf, offset = window.buf, window.start
+
+        match = _NON_SPACE.search(buf, pos - offset)
+        if not match:
+            return None
+        start = match.start() + offset
+
+        limit = self._limit(window, start)
+        if not _NON_SPACE.search(buf, limit - offset):
+            # The rest of the text fits in this chunk; it may still grow unless final
+            end = len(buf.rstrip()) + offset
+            if not final or end <= min_end:
+                return None
+            return start, end, limit
+
+        floor = max(min_end, start)
+        for pattern in (_LAST_SENTENCE_END, _LAST_WORD_END):
+            match = pattern.match(buf, start - offset, limit - offset + 1)
+            if match and match.end() + offset > floor:
+                return start, match.end() + offset, limit
+
+        # A single word longer than a chunk is cut hard
+        return start, limit, limit
+
+    def _limit(self, window: _Window, start: int) -> int:
+        """Offset just past the largest window from `start` that fits in a chunk."""
+        if self.unit == "chars":
+            return start + self.chunk_size
+        match = self._token_window.match(window.buf, start - window.start)
+        return match.end() + window.start
+
+    def _overlap_start(self, window: _Window, start: int, end: int, limit: int) -> int:
+        """Start of the next chunk: the last `overlap` units of [start, end), on a word boundary."""
+        if not self.overlap:
+            return end
+
+        if self.unit == "chars":
+            overlap_chars = self.overlap
+        else:
+            # Convert with the average token length of the chunk window
+            overlap_chars = (limit - start) * self.overlap // self.chunk_size
+
+        if end - start <= overlap_chars:
+            return end
+        candidate = end - overlap_chars
+
+        match = _NEXT_WORD.search(window.buf, candidate - window.start, end - window.start)
+        return match.start() + window.start if match else end
+
+
+class _TablePacker:
+    """Packs consecutive TableRows into chunks of whole rows under a repeated header."""
+
+    def __init__(self, chunker: TextChunker, offset: int):
+        self.chunker = chunker
+        self.offset = offset  # where the next chunk starts in the extracted text
+        self.header = ""
+        self.header_size = 0
+        self.rows: List[str] = []
+        self.size = 0
+
+    def add(self, table: TableRows, state: dict) -> Iterator[Chunk]:
+        if table.header != self.header:
+            yield from self.flush(state)
+            self.header = table.header
+            self.header_size = self.chunker.measure(table.header) + 1 if table.header else 0
+            if self.header_size > self.chunker.chunk_size * self.chunker.MAX_HEADER_SHARE:
+                self.header_size = 0
+
+        budget = self.chunker.chunk_size - self.header_size
+        for row in table.rows:
+            size = self.chunker.measure(row) + 1
+            if self.rows and self.size + size > budget:
+                yield from self.flush(state)
+
+            if size > budget:
+                # A row longer than a chunk is split like text
+                pieces = TextChunker(budget, 0, self.chunker.unit).chunk(row)
+                for piece in pieces:
+                    self.rows = [piece.text]
+                    yield from self.flush(state)
+                continue
+
+            self.rows.append(row)
+            self.size += size
+
+    def flush(self, state: dict) -> Iterator[Chunk]:
+        if not self.rows:
+            return
+
+        lines = [self.header, *self.rows] if self.header_size else self.rows
+        text = "\n".join(lines)
+        start = self.offset
+        yield Chunk(index=state["index"], text=text, start=start, end=start + len(text))
+
+        state["index"] += 1
+        self.offset = start + len(text) + 1
+        self.rows = []
+        self.size = 0
@@ -0,0 +1,176 @@
+"""
+Collection Migration - Per-KB Collections to Shared Collections
+================================================================
+Move os vetores de coleções por knowledge base para a coleção compartilhada (partition key kb_id).
+
+Usage:
+    python -m knowledge_base_agent.processing.collection_migration [--kb KB_ID ...] [--keep-source]
+"""
+
+import argparse
+import asyncio
+import time
+from typing import List, Optional, Set
+from uuid import UUID
+import logging
+
+from ..core.config import KBConfig, get_config
+from ..core.models import DatabaseManager, KnowledgeBase, get_db
+from .embeddings import EmbeddingService
+
+logger = logging.getLogger(__name__)
+
+
+class CollectionMigrator:
+    """
+    Moves knowledge bases from their own Milvus collection into the shared
+    collection of their embedding provider.
+
+    For each KB: copy every row (vector and dynamic fields, tagged with
+    `kb_id`) in batches through the VectorWriter, point the KB at the shared
+    collection, copy rows written to the old collection meanwhile, check the
+    row counts match, then drop the old collection. A KB whose copy fails
+    stays on its own collection (rerunning is safe: rows are upserted by
+    ID); if the final count check fails, the old collection is kept.
+
+    Deletes that race the copy can leave rows behind, so run it while the
+    KBs are not being ingested into (e.g. with the IngestionWorker stopped).
+
+    Usage:
+        migrator = CollectionMigrator(embeddings, db, config)
+        await migrator.migrate()  # every per-KB collection
+    """
+
+    def __init__(self, embeddings: EmbeddingService, db: DatabaseManager, config: KBConfig):
+        self.embeddings = embeddings
+        self.milvus = embeddings.milvus
+        self.executors = embeddings.executors
+        self.db = db
+        self.batch_size = max(1, config.milvus_migration_batch)
+
+    async def migrate(self, kb_ids: List[str] = None, drop_source: bool = True) -> dict:
+        """Migrate the given KBs (default: all on per-KB collections). Returns per-KB results."""
+        self.db.initialize()  # upgrades databases created before shared_collection
+
+        session = self.db.get_session()
+        try:
+            query = session.query(KnowledgeBase.id).filter(KnowledgeBase.shared_collection.is_(None))
+            if kb_ids:
+                query = query.filter(KnowledgeBase.id.in_([UUID(kb_id) for kb_id in kb_ids]))
+            pending = [row.id for row in query.all()]
+        finally:
+            session.close()
+
+        results = {"migrated": 0, "failed": 0, "rows": 0, "kbs": {}}
+        for kb_id in pending:
+            try:
+                result = await self.migrate_kb(kb_id, drop_source=drop_source)
+                results["migrated"] += 1
+                results["rows"] += result["rows"]
+            except Exception as e:
+                logger.error(f"Failed to migrate KB {kb_id}: {e}")
+                result = {"error": str(e)}
+                results["failed"] += 1
+            results["kbs"][str(kb_id)] = result
+
+        return results
+
+    async def migrate_kb(self, kb_id: UUID, drop_source: bool = True) -> dict:
+        """Move one KB's vectors into its provider's shared collection."""
+        started = time.monotonic()
+        session = self.db.get_session()
+        try:
+            kb = session.query(KnowledgeBase).filter(KnowledgeBase.id == kb_id).one()
+            if kb.shared_collection:
+                return {"collection": kb.shared_collection, "rows": 0, "skipped": True}
+
+            source = kb.milvus_collection
+            target = await self.embeddings.ensure_shared_collection(kb.embedding_provider)
+            has_source = bool(source) and await self._milvus(self.milvus.has_collection, source)
+
+            copied: Set[str] = set()
+            if has_source:
+                await self._copy(source, target, str(kb.id), copied)
+
+            # The shared collection's index replaces the KB's own profile
+            index = self.embeddings.shared_index_profile()
+            kb.shared_collection = target
+            kb.index_type = index.index_type
+            kb.index_params = index.build_params
+            kb.search_params = index.search_params
+            session.commit()
+
+            if has_source:
+                # Rows written to the old collection before the switch was seen
+                await self._copy(source, target, str(kb.id), copied)
+                await self._verify(source, target, str(kb.id))
+                if drop_source:
+                    await self.embeddings.delete_collection(source)
+
+            elapsed = time.monotonic() - started
+            logger.info(f"Migrated KB {kb.id}: {len(copied)} vectors {source} -> {target} in {elapsed:.1f}s")
+            return {"collection": target, "rows": len(copied), "seconds": round(elapsed, 2)}
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    async def _copy(self, source: str, target: str, kb_id: str, copied: Set[str]):
+        """Upsert the source rows not in `copied` into the target, tagged with kb_id."""
+        iterator = await self._milvus(
+            self.milvus.query_iterator, source, batch_size=self.batch_size, output_fields=["*"]
+        )
+        try:
+            while True:
+                rows = await self._milvus(iterator.next)
+                if not rows:
+                    break
+                rows = [row for row in rows if row["id"] not in copied]
+                for row in rows:
+                    row["kb_id"] = kb_id
+                if rows:
+                    await self.embeddings.writer.write(target, rows, upsert=True)
+                    copied.update(row["id"] for row in rows)
+        finally:
+            iterator.close()
+
+    async def _verify(self, source: str, target: str, kb_id: str):
+        source_count = await self._count(source)
+        target_count = await self._count(target, EmbeddingService.kb_filter([kb_id]))
+        if target_count < source_count:
+            raise RuntimeError(
+                f"{target} has {target_count} rows of KB {kb_id}, expected {source_count}; "
+                f"source collection {source} kept"
+            )
+
+    async def _count(self, collection: str, expr: str = "") -> int:
+        rows = await self._milvus(
+            self.milvus.query, collection, filter=expr, output_fields=["count(*)"], consistency_level="Strong"
+        )
+        return rows[0]["count(*)"] if rows else 0
+
+    async def _milvus(self, fn, *args, **kwargs):
+        return await self.executors.run("milvus", fn, *args, **kwargs)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Move per-KB Milvus collections into shared collections")
+    parser.add_argument("--kb", action="append", default=None, help="KB ID to migrate (repeatable; default: all)")
+    parser.add_argument("--keep-source", action="store_true", help="keep the per-KB collections")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    config = get_config()
+    db = get_db()
+    db.initialize()
+
+    migrator = CollectionMigrator(EmbeddingService(config), db, config)
+    results = asyncio.run(migrator.migrate(args.kb, drop_source=not args.keep_source))
+    for kb_id, result in results["kbs"].items():
+        print(f"{kb_id}: {result}")
+    print(f"Migrated {results['migrated']} KBs ({results['rows']} vectors), {results['failed']} failed")
+
+
+if __name__ == "__main__":
+    main()
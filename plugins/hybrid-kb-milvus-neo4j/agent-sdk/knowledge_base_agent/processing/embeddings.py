@@ -3,31 +3,73 @@ Embedding Service - Milvus Vector Operations
 =============================================
 """
 
-from typing import List, Optional, Literal
+from typing import Dict, List, Optional, Literal, Tuple
+import asyncio
 import logging
 import hashlib
+import time
 
 from pymilvus import MilvusClient, DataType
 import google.generativeai as genai
 import cohere
 
 from ..core.config import KBConfig
+from ..core.executors import get_executors
+from .cache import EmbeddingCache
+from .index_profiles import IndexProfile
+from .rate_control import ProviderRateController
+from .vector_writer import VectorWriter
 
 logger = logging.getLogger(__name__)
 
 
 class EmbeddingService:
-    """Manages embeddings and Milvus operations."""
+    """
+    Manages embeddings and Milvus operations.
+
+    Provider, Milvus and embedding cache calls are blocking; they run on the
+    "embeddings", "milvus" and "cache" thread pools (see core.executors). Embedding requests go
+    through a per-provider ProviderRateController, which adapts concurrency
+    to the provider's rate limits and retries throttled requests.
+
+    A knowledge base's vectors live either in its own collection or in a
+    shared collection per provider, where a `kb_id` partition key keeps
+    each KB's rows together; methods taking `kb_id`/`kb_ids` filter on it.
+    """
 
     DIMENSIONS = {
         "google": 768,   # text-embedding-004
         "cohere": 1024   # embed-v4
     }
 
+    MODELS = {
+        "google": "models/text-embedding-004",
+        "cohere": "embed-english-v3.0"
+    }
+
+    COHERE_INPUT_TYPES = {
+        "RETRIEVAL_DOCUMENT": "search_document",
+        "RETRIEVAL_QUERY": "search_query"
+    }
+
+    # Per-request limits imposed by each provider's batch endpoint
+    BATCH_LIMITS = {
+        "google": {"max_texts": 100, "max_tokens": 20000},
+        "cohere": {"max_texts": 96, "max_tokens": 48000}
+    }
+
     def __init__(self, config: KBConfig):
         self.config = config
         self.milvus = MilvusClient(uri=config.milvus_uri)
+        self.executors = get_executors(config)
         self._cohere_client = None
+        self.cache = EmbeddingCache(config) if config.embedding_cache_enabled else None
+        self.writer = VectorWriter.from_config(self.milvus, config, self.executors)
+        self.rate_control = {
+            provider: ProviderRateController.from_config(provider, config)
+            for provider in self.MODELS
+        }
+        self._shared_collections = set()
 
         if config.google_api_key:
             genai.configure(api_key=config.google_api_key)
@@ -39,26 +81,33 @@ class EmbeddingService:
     ) -> List[float]:
         """Generate embedding for text."""
         try:
-            if provider == "google":
-                result = genai.embed_content(
-                    model="models/text-embedding-004",
-                    content=text,
-                    task_type="RETRIEVAL_DOCUMENT"
-                )
-                return result['embedding']
-            else:
-                if self._cohere_client is None:
-                    self._cohere_client = cohere.Client(self.config.cohere_api_key)
-                response = self._cohere_client.embed(
-                    texts=[text],
-                    model="embed-english-v3.0",
-                    input_type="search_document"
-                )
-                return response.embeddings[0]
+            return (await self._embed_cached([text], provider, "RETRIEVAL_DOCUMENT"))[0]
         except Exception as e:
             logger.error(f"Embedding error: {e}")
             raise
 
+    async def generate_embeddings(
+        self,
+        texts: List[str],
+        provider: Literal["google", "cohere"] = "google"
+    ) -> List[List[float]]:
+        """
+        Generate embeddings for many texts.
+
+        Texts are packed into provider-sized requests (by count and token budget)
+        and the requests run concurrently, as many as the provider's rate
+        controller currently allows.
+        The returned embeddings are in the same order as `texts`.
+        """
+        if not texts:
+            return []
+
+        try:
+            return await self._embed_cached(texts, provider, "RETRIEVAL_DOCUMENT")
+        except Exception as e:
+            logger.error(f"Batch embedding error: {e}")
+            raise
+
     async def generate_query_embedding(
         self,
         query: str,
@@ -66,100 +115,364 @@ class EmbeddingService:
     ) -> List[float]:
         """Generate embedding for query."""
         try:
-            if provider == "google":
-                result = genai.embed_content(
-                    model="models/text-embedding-004",
-                    content=query,
-                    task_type="RETRIEVAL_QUERY"
-                )
-                return result['embedding']
-            else:
-                if self._cohere_client is None:
-                    self._cohere_client = cohere.Client(self.config.cohere_api_key)
-                response = self._cohere_client.embed(
-                    texts=[query],
-                    model="embed-english-v3.0",
-                    input_type="search_query"
-                )
-                return response.embeddings[0]
+            return (await self._embed_cached([query], provider, "RETRIEVAL_QUERY"))[0]
         except Exception as e:
             logger.error(f"Query embedding error: {e}")
             raise
 
+    async def _embed_cached(
+        self,
+        texts: List[str],
+        provider: str,
+        task_type: str
+    ) -> List[List[float]]:
+        """Serve texts from the embedding cache and embed only the misses."""
+        if self.cache is None:
+            return await self._embed_concurrently(texts, provider, task_type)
+
+        keys = [
+            EmbeddingCache.make_key(provider, self.MODELS[provider], task_type, text)
+            for text in texts
+        ]
+        embeddings = await self.executors.run("cache", self.cache.get_many, keys)
+
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            fresh = await self._embed_concurrently([texts[i] for i in missing], provider, task_type)
+            for i, embedding in zip(missing, fresh):
+                embeddings[i] = embedding
+            await self.executors.run("cache", self.cache.set_many, {keys[i]: embeddings[i] for i in missing})
+
+        return embeddings
+
+    async def _embed_concurrently(
+        self,
+        texts: List[str],
+        provider: str,
+        task_type: str
+    ) -> List[List[float]]:
+        """Embed texts in provider-sized batches, running batches concurrently."""
+        controller = self.rate_control[provider]
+
+        async def embed(start: int, end: int) -> List[List[float]]:
+            batch = texts[start:end]
+            return await controller.run(
+                lambda: self.executors.run("embeddings", self._embed_batch, batch, provider, task_type),
+                tokens=sum(self.estimate_tokens(text) for text in batch)
+            )
+
+        batches = await asyncio.gather(
+            *(embed(start, end) for start, end in self._pack_batches(texts, provider))
+        )
+        return [embedding for batch in batches for embedding in batch]
+
+    def _embed_batch(
+        self,
+        texts: List[str],
+        provider: str,
+        task_type: str
+    ) -> List[List[float]]:
+        """Embed a list of texts in a single provider request."""
+        if provider == "google":
+            result = genai.embed_content(
+                model=self.MODELS["google"],
+                content=texts,
+                task_type=task_type
+            )
+            return result['embedding']
+
+        if self._cohere_client is None:
+            self._cohere_client = cohere.Client(self.config.cohere_api_key)
+        response = self._cohere_client.embed(
+            texts=texts,
+            model=self.MODELS["cohere"],
+            input_type=self.COHERE_INPUT_TYPES[task_type]
+        )
+        return response.embeddings
+
+    def _pack_batches(self, texts: List[str], provider: str) -> List[Tuple[int, int]]:
+        """Split texts into (start, end) ranges that fit one provider request."""
+        limits = self.BATCH_LIMITS[provider]
+        max_texts = max(1, min(self.config.embedding_batch_size, limits["max_texts"]))
+        max_tokens = max(1, min(self.config.embedding_batch_max_tokens, limits["max_tokens"]))
+
+        batches = []
+        start = 0
+        tokens = 0
+        for i, text in enumerate(texts):
+            text_tokens = self.estimate_tokens(text)
+            if i > start and (i - start >= max_texts or tokens + text_tokens > max_tokens):
+                batches.append((start, i))
+                start = i
+                tokens = 0
+            tokens += text_tokens
+        batches.append((start, len(texts)))
+        return batches
+
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        """Rough token count (~4 characters per token)."""
+        return len(text) // 4 + 1
+
     async def create_collection(
         self,
         collection_name: str,
-        provider: Literal["google", "cohere"] = "google"
+        provider: Literal["google", "cohere"] = "google",
+        index: IndexProfile = None,
+        partition_key: bool = False
     ):
-        """Create a Milvus collection."""
+        """
+        Create a Milvus collection indexed with `index` (AUTOINDEX by default).
+
+        Same layout as the MilvusClient quick setup ("id" primary key,
+        "vector" field, dynamic fields for the rest), except that the key is
+        a VARCHAR: chunk IDs are strings. With `partition_key`, `kb_id` is a
+        partition key field, for collections shared by many KBs.
+        """
         dim = self.DIMENSIONS[provider]
+        index = index or IndexProfile()
+        index.validate_dimension(dim)
 
-        if self.milvus.has_collection(collection_name):
+        if await self._milvus("has_collection", collection_name):
             logger.info(f"Collection {collection_name} already exists")
             return
 
-        self.milvus.create_collection(
+        schema = MilvusClient.create_schema(auto_id=False, enable_dynamic_field=True)
+        schema.add_field("id", DataType.VARCHAR, is_primary=True, max_length=255)
+        schema.add_field("vector", DataType.FLOAT_VECTOR, dim=dim)
+
+        options = {}
+        if partition_key:
+            schema.add_field("kb_id", DataType.VARCHAR, max_length=64, is_partition_key=True)
+            options["num_partitions"] = self.config.milvus_partition_count
+
+        await self._milvus(
+            "create_collection",
             collection_name=collection_name,
-            dimension=dim,
-            metric_type="COSINE",
-            auto_id=False
+            schema=schema,
+            index_params=self.build_index_params(index),
+            **options
+        )
+        logger.info(f"Created collection: {collection_name} (dim={dim}, index={index.index_type})")
+
+    def shared_collection_name(self, provider: str) -> str:
+        return f"{self.config.milvus_shared_collection}_{provider}"
+
+    def shared_index_profile(self) -> IndexProfile:
+        """Index profile of the shared collections (the config defaults)."""
+        return IndexProfile.create(
+            self.config.default_index_type,
+            self.config.default_index_params,
+            self.config.default_search_params
+        )
+
+    async def ensure_shared_collection(self, provider: Literal["google", "cohere"] = "google") -> str:
+        """Create the provider's shared, kb_id-partitioned collection if needed. Returns its name."""
+        name = self.shared_collection_name(provider)
+        if name not in self._shared_collections:
+            await self.create_collection(name, provider, self.shared_index_profile(), partition_key=True)
+            self._shared_collections.add(name)
+        return name
+
+    async def reindex(self, collection_name: str, index: IndexProfile):
+        """
+        Rebuild the vector index of a collection with another profile.
+
+        The collection is released while the index is rebuilt, so searches
+        on it fail until it is loaded again.
+        """
+        started = time.monotonic()
+        await self._milvus("release_collection", collection_name)
+        for index_name in await self._milvus("list_indexes", collection_name, field_name="vector"):
+            await self._milvus("drop_index", collection_name, index_name=index_name)
+
+        await self._milvus("create_index", collection_name, self.build_index_params(index))
+        await self._milvus("load_collection", collection_name)
+        logger.info(
+            f"Re-indexed {collection_name} with {index.index_type} {index.build_params} "
+            f"in {time.monotonic() - started:.1f}s"
+        )
+
+    @staticmethod
+    def build_index_params(index: IndexProfile):
+        """Milvus index params for the `vector` field of a collection."""
+        params = MilvusClient.prepare_index_params()
+        params.add_index(
+            field_name="vector",
+            index_name="vector",
+            index_type=index.index_type,
+            metric_type=index.metric_type,
+            params=index.build_params
         )
-        logger.info(f"Created collection: {collection_name} (dim={dim})")
+        return params
 
     async def delete_collection(self, collection_name: str):
         """Delete a Milvus collection."""
-        if self.milvus.has_collection(collection_name):
-            self.milvus.drop_collection(collection_name)
+        if await self._milvus("has_collection", collection_name):
+            await self._milvus("drop_collection", collection_name)
             logger.info(f"Deleted collection: {collection_name}")
 
     async def insert_vectors(
         self,
         collection_name: str,
-        vectors: List[dict]
+        vectors: List[dict],
+        upsert: bool = False
     ) -> List[str]:
         """
         Insert vectors into collection.
 
         vectors: List of dicts with 'id', 'vector', 'text', 'metadata'
+
+        Writes go through the batching VectorWriter; with `upsert`, rows with
+        existing IDs are replaced, so re-running a file is idempotent.
         """
         if not vectors:
             return []
 
-        self.milvus.insert(collection_name=collection_name, data=vectors)
-        logger.info(f"Inserted {len(vectors)} vectors into {collection_name}")
+        started = time.monotonic()
+        await self.writer.write(collection_name, vectors, upsert=upsert)
+        elapsed = max(time.monotonic() - started, 1e-9)
+        logger.info(
+            f"{'Upserted' if upsert else 'Inserted'} {len(vectors)} vectors into {collection_name} "
+            f"({len(vectors) / elapsed:.0f} rows/s)"
+        )
         return [v['id'] for v in vectors]
 
-    async def delete_vectors(
+    async def get_vectors(
         self,
         collection_name: str,
         ids: List[str]
+    ) -> Dict[str, List[float]]:
+        """Fetch stored vectors by ID. Missing IDs are omitted."""
+        if not ids:
+            return {}
+
+        rows = await self._milvus(
+            "get",
+            collection_name=collection_name,
+            ids=ids,
+            output_fields=["vector"]
+        )
+        return {row["id"]: list(row["vector"]) for row in rows}
+
+    async def update_chunk_indexes(
+        self,
+        collection_name: str,
+        indexes: Dict[str, int]
+    ):
+        """Set a new chunk_index on existing vectors (milvus_id -> index), keeping their embeddings."""
+        if not indexes:
+            return
+
+        rows = await self._milvus(
+            "get",
+            collection_name=collection_name,
+            ids=list(indexes),
+            output_fields=["*"]
+        )
+        for row in rows:
+            row["chunk_index"] = indexes[row["id"]]
+
+        if rows:
+            await self.writer.write(collection_name, rows, upsert=True)
+        logger.info(f"Re-indexed {len(rows)} vectors in {collection_name}")
+
+    async def delete_vectors(
+        self,
+        collection_name: str,
+        ids: List[str],
+        kb_id: str = None
     ):
         """Delete vectors by IDs."""
         if not ids:
             return
 
-        self.milvus.delete(
+        await self._milvus(
+            "delete",
             collection_name=collection_name,
-            filter=f"id in {ids}"
+            filter=self._with_kb_filter(f"id in {ids}", kb_id)
         )
         logger.info(f"Deleted {len(ids)} vectors from {collection_name}")
 
+    async def delete_file_vectors(
+        self,
+        collection_name: str,
+        file_id: str,
+        from_index: int = 0,
+        kb_id: str = None
+    ):
+        """Delete a file's vectors with chunk_index >= from_index."""
+        await self._milvus(
+            "delete",
+            collection_name=collection_name,
+            filter=self._with_kb_filter(f'file_id == "{file_id}" and chunk_index >= {int(from_index)}', kb_id)
+        )
+        logger.info(f"Deleted vectors of file {file_id} from chunk {from_index} in {collection_name}")
+
+    async def delete_kb_vectors(self, collection_name: str, kb_id: str):
+        """Delete every vector of a knowledge base from a shared collection."""
+        await self._milvus(
+            "delete",
+            collection_name=collection_name,
+            filter=self.kb_filter([kb_id])
+        )
+        logger.info(f"Deleted vectors of KB {kb_id} from {collection_name}")
+
+    @staticmethod
+    def kb_filter(kb_ids: List[str]) -> str:
+        """Milvus filter expression selecting the rows of these knowledge bases."""
+        if len(kb_ids) == 1:
+            return f'kb_id == "{kb_ids[0]}"'
+        return f"kb_id in {[str(kb_id) for kb_id in kb_ids]}"
+
+    @classmethod
+    def _with_kb_filter(cls, expr: str, kb_id: Optional[str]) -> str:
+        # The partition key in the filter limits the delete/search to the KB's partition
+        return f"{cls.kb_filter([kb_id])} and ({expr})" if kb_id else expr
+
     async def search(
         self,
         collection_name: str,
         query: str,
         provider: Literal["google", "cohere"] = "google",
-        top_k: int = 10
+        top_k: int = 10,
+        index: IndexProfile = None,
+        search_params: dict = None,
+        consistency_level: str = None,
+        kb_ids: List[str] = None,
+        query_embedding: List[float] = None
     ) -> List[dict]:
-        """Search for similar vectors."""
+        """
+        Search for similar vectors.
+
+        `search_params` override the KB's defaults from `index` (ef for
+        HNSW, nprobe for IVF, search_list for DISKANN): higher values trade
+        latency for recall. `consistency_level` ("Strong", "Bounded",
+        "Session", "Eventually") overrides the collection's.
+
+        In a shared collection, `kb_ids` restricts the search to those
+        knowledge bases (one request for all of them); results carry `kb_id`.
+
+        Pass `query_embedding` to reuse a query vector across searches
+        instead of embedding `query` again.
+        """
         try:
-            query_embedding = await self.generate_query_embedding(query, provider)
+            if query_embedding is None:
+                query_embedding = await self.generate_query_embedding(query, provider)
 
-            results = self.milvus.search(
+            request = {}
+            if consistency_level:
+                request["consistency_level"] = consistency_level
+            if kb_ids:
+                request["filter"] = self.kb_filter(kb_ids)
+            results = await self._milvus(
+                "search",
                 collection_name=collection_name,
                 data=[query_embedding],
                 limit=top_k,
-                output_fields=["text", "file_id", "chunk_index", "metadata"]
+                output_fields=["text", "file_id", "kb_id", "chunk_index", "metadata"],
+                search_params=(index or IndexProfile()).search_request(search_params, limit=top_k),
+                **request
             )
 
             formatted = []
@@ -170,6 +483,7 @@ class EmbeddingService:
                         "score": hit.get("distance", 0),
                         "text": hit.get("entity", {}).get("text", ""),
                         "file_id": hit.get("entity", {}).get("file_id", ""),
+                        "kb_id": hit.get("entity", {}).get("kb_id", ""),
                         "chunk_index": hit.get("entity", {}).get("chunk_index", 0),
                         "metadata": hit.get("entity", {}).get("metadata", {}),
                         "source": "vector"
@@ -180,6 +494,10 @@ class EmbeddingService:
             logger.error(f"Search error: {e}")
             return []
 
+    async def _milvus(self, method: str, *args, **kwargs):
+        """Run a MilvusClient call on the Milvus thread pool."""
+        return await self.executors.run("milvus", getattr(self.milvus, method), *args, **kwargs)
+
     def health_check(self) -> dict:
         """Check Milvus health."""
         try:
@@ -187,7 +505,11 @@ class EmbeddingService:
             return {
                 "status": "healthy",
                 "uri": self.config.milvus_uri,
-                "collection_count": len(collections)
+                "collection_count": len(collections),
+                "embedding_cache": self.cache.stats() if self.cache else None,
+                "vector_writer": self.writer.stats(),
+                "rate_control": {provider: c.stats() for provider, c in self.rate_control.items()},
+                "executors": self.executors.stats()
             }
         except Exception as e:
             return {"status": "unhealthy", "error": str(e)}
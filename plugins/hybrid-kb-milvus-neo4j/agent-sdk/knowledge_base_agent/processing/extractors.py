@@ -0,0 +1,467 @@
+"""
+Extractors - Pluggable Text Extraction
+=======================================
+Registro de extratores por formato, com execução em processos de trabalho
+para formatos pesados (PDF, DOCX, XLSX, PPTX) e segmentos em streaming.
+"""
+
+import io
+import os
+import asyncio
+import contextlib
+import csv
+import codecs
+import json
+import pickle
+import queue
+import threading
+import time
+import multiprocessing
+from dataclasses import dataclass
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Union
+import logging
+
+from ..core.config import KBConfig
+from .chunking import Segment, TableRows
+
+logger = logging.getLogger(__name__)
+
+# Characters decoded per block when streaming plain-text formats
+TEXT_BLOCK_CHARS = 1024 * 1024
+
+# Spreadsheet rows per TableRows segment
+TABLE_GROUP_ROWS = 1000
+
+ExtractFn = Callable[[BinaryIO, str], Iterator[Segment]]
+
+
+@dataclass
+class Extractor:
+    """
+    A text extractor for one file type.
+
+    `fn(source, filename)` yields text segments (or TableRows for
+    spreadsheets) from a seekable binary file.
+    Heavy extractors are CPU-bound parsers; in process mode they run in
+    extraction worker processes, so `fn` must be a module-level function.
+    """
+    file_type: str
+    fn: ExtractFn
+    heavy: bool = False
+    timeout: float = 300
+
+
+class ExtractorRegistry:
+    """
+    Maps file types to extractors.
+
+    Usage:
+        @registry.register("rtf", heavy=True, timeout=60)
+        def extract_rtf(source, filename):
+            yield ...
+    """
+
+    def __init__(self):
+        self._extractors: Dict[str, Extractor] = {}
+        self._fallback: Optional[Extractor] = None
+
+    def register(self, file_type: str, fn: ExtractFn = None, heavy: bool = False, timeout: float = 300):
+        """Register `fn` for `file_type` ("*" for the fallback). Usable as a decorator."""
+        def decorator(fn: ExtractFn) -> ExtractFn:
+            extractor = Extractor(file_type=file_type, fn=fn, heavy=heavy, timeout=timeout)
+            if file_type == "*":
+                self._fallback = extractor
+            else:
+                self._extractors[file_type] = extractor
+            return fn
+
+        return decorator(fn) if fn is not None else decorator
+
+    def get(self, file_type: str) -> Extractor:
+        extractor = self._extractors.get(file_type, self._fallback)
+        if extractor is None:
+            raise ValueError(f"No extractor registered for {file_type}")
+        return extractor
+
+    @property
+    def file_types(self) -> List[str]:
+        return sorted(self._extractors)
+
+
+registry = ExtractorRegistry()
+
+
+# ============================================================================
+# BUILT-IN EXTRACTORS
+# ============================================================================
+
+def iter_decoded(source: BinaryIO) -> Iterator[str]:
+    """Incrementally decode UTF-8 text from a binary file in fixed-size blocks."""
+    reader = codecs.getreader('utf-8')(source, errors='ignore')
+    while True:
+        block = reader.read(TEXT_BLOCK_CHARS)
+        if not block:
+            break
+        yield block
+
+
+def format_row(cells) -> str:
+    """One spreadsheet row as text; empty cells keep their position."""
+    return ' | '.join('' if c is None else str(c) for c in cells).rstrip(' |')
+
+
+def iter_table(rows: Iterator, header_prefix: str = "") -> Iterator[TableRows]:
+    """Group rows into TableRows; the first non-empty row is the header."""
+    header = None
+    group = []
+    emitted = False
+    for cells in rows:
+        line = format_row(cells)
+        if not line:
+            continue
+        if header is None:
+            header = header_prefix + line
+            continue
+
+        group.append(line)
+        if len(group) >= TABLE_GROUP_ROWS:
+            yield TableRows(header, group)
+            group = []
+            emitted = True
+
+    if group:
+        yield TableRows(header, group)
+    elif header is not None and not emitted:
+        yield header  # a header without rows is plain text
+
+
+@registry.register("txt")
+@registry.register("md")
+@registry.register("*")
+def extract_plain_text(source: BinaryIO, filename: str) -> Iterator[str]:
+    yield from iter_decoded(source)
+
+
+@registry.register("csv")
+def extract_csv(source: BinaryIO, filename: str) -> Iterator[Segment]:
+    text = io.TextIOWrapper(source, encoding='utf-8', errors='ignore', newline='')
+    try:
+        yield from iter_table(csv.reader(text))
+    finally:
+        text.detach()  # leave the caller's file open
+
+
+@registry.register("json")
+def extract_json(source: BinaryIO, filename: str) -> Iterator[str]:
+    data = json.load(source)
+    yield json.dumps(data, indent=2)
+
+
+@registry.register("html")
+def extract_html(source: BinaryIO, filename: str) -> Iterator[str]:
+    from html.parser import HTMLParser
+
+    class TextExtractor(HTMLParser):
+        def __init__(self):
+            super().__init__()
+            self.text = []
+
+        def handle_data(self, data):
+            self.text.append(data.strip())
+
+    parser = TextExtractor()
+    for block in iter_decoded(source):
+        parser.feed(block)
+        yield ' '.join(parser.text) + ' '
+        parser.text.clear()
+    parser.close()
+    yield ' '.join(parser.text)
+
+
+@registry.register("pdf", heavy=True, timeout=600)
+def extract_pdf(source: BinaryIO, filename: str) -> Iterator[str]:
+    try:
+        import pymupdf
+    except ImportError:
+        logger.warning("pymupdf not installed, using fallback")
+        yield f"[PDF content from {filename}]"
+        return
+
+    # Open spooled files by path so pymupdf reads pages on demand
+    path = getattr(source, 'name', None)
+    if isinstance(path, str):
+        doc = pymupdf.open(path, filetype="pdf")
+    else:
+        doc = pymupdf.open(stream=source.read(), filetype="pdf")
+    try:
+        for page in doc:
+            yield page.get_text()
+    finally:
+        doc.close()
+
+
+@registry.register("docx", heavy=True, timeout=120)
+def extract_docx(source: BinaryIO, filename: str) -> Iterator[str]:
+    try:
+        from docx import Document
+    except ImportError:
+        logger.warning("python-docx not installed")
+        yield f"[DOCX content from {filename}]"
+        return
+
+    doc = Document(source)
+    yield '\n'.join([para.text for para in doc.paragraphs])
+
+
+@registry.register("xlsx", heavy=True, timeout=300)
+def extract_xlsx(source: BinaryIO, filename: str) -> Iterator[Segment]:
+    try:
+        import openpyxl
+    except ImportError:
+        logger.warning("openpyxl not installed")
+        yield f"[XLSX content from {filename}]"
+        return
+
+    wb = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    try:
+        for sheet in wb.worksheets:
+            prefix = f"{sheet.title}: " if len(wb.worksheets) > 1 else ""
+            yield from iter_table(sheet.iter_rows(values_only=True), prefix)
+    finally:
+        wb.close()
+
+
+@registry.register("pptx", heavy=True, timeout=120)
+def extract_pptx(source: BinaryIO, filename: str) -> Iterator[str]:
+    try:
+        from pptx import Presentation
+    except ImportError:
+        logger.warning("python-pptx not installed")
+        yield f"[PPTX content from {filename}]"
+        return
+
+    prs = Presentation(source)
+    text = []
+    for slide in prs.slides:
+        for shape in slide.shapes:
+            if hasattr(shape, "text"):
+                text.append(shape.text)
+    yield '\n'.join(text)
+
+
+# ============================================================================
+# EXECUTION
+# ============================================================================
+
+# Segments a worker may extract ahead of the consumer (bounds memory per file)
+STREAM_BUFFER_SEGMENTS = 8
+
+# How often a consumer waiting on a worker checks that it is still alive
+WORKER_POLL_SECONDS = 1.0
+
+
+def _limit_worker_memory(max_bytes: int):
+    """Cap the worker's address space (Unix only)."""
+    if not max_bytes:
+        return
+    try:
+        import resource
+        resource.setrlimit(resource.RLIMIT_AS, (max_bytes, max_bytes))
+    except (ImportError, ValueError, OSError) as e:
+        logger.warning(f"Could not limit extraction worker memory: {e}")
+
+
+def _open_payload(payload: Union[str, bytes]) -> BinaryIO:
+    """A file path or raw bytes, as a readable binary file."""
+    if isinstance(payload, str):
+        return open(payload, "rb")
+    return io.BytesIO(payload)
+
+
+def _portable_error(error: Exception) -> Exception:
+    """The error itself if it survives pickling, else a RuntimeError describing it."""
+    try:
+        pickle.loads(pickle.dumps(error))
+        return error
+    except Exception:
+        return RuntimeError(f"{type(error).__name__}: {error}")
+
+
+def _worker_main(tasks, results, max_bytes: int):
+    """
+    Extraction worker process: run tasks one at a time, streaming each
+    task's segments back through `results` as they are extracted.
+    """
+    _limit_worker_memory(max_bytes)
+    results.put(("ready", None))
+    while True:
+        task = tasks.get()
+        if task is None:
+            return
+
+        fn, payload, filename = task
+        try:
+            with _open_payload(payload) as source:
+                for segment in fn(source, filename):
+                    results.put(("segment", segment))
+            results.put(("done", None))
+        except Exception as e:
+            results.put(("error", _portable_error(e)))
+
+
+class _ExtractionWorker:
+    """A worker process with its own task and result queues."""
+
+    def __init__(self, context, max_bytes: int):
+        self.tasks = context.Queue()
+        # Bounded: the worker blocks instead of running ahead of the consumer
+        self.results = context.Queue(maxsize=STREAM_BUFFER_SEGMENTS)
+        self.process = context.Process(
+            target=_worker_main,
+            args=(self.tasks, self.results, max_bytes),
+            name="kb-extract",
+            daemon=True
+        )
+        self.process.start()
+        self.started = False  # set once the process has booted (spawn re-imports modules)
+        self.completed = 0
+
+    def stop(self, kill: bool = False):
+        """Let the worker exit after its current task, or kill it right away."""
+        if kill:
+            self.process.terminate()
+        else:
+            self.tasks.put(None)
+        for q in (self.tasks, self.results):
+            q.close()
+            q.cancel_join_thread()
+        if kill:
+            self.process.join(timeout=5)
+
+
+class TextExtraction:
+    """
+    Runs registered extractors.
+
+    Light formats stream inline (in the calling thread). Heavy formats run
+    in worker processes when `extraction_mode` is "process", so large PDFs
+    and Office documents use all cores instead of contending for the GIL.
+
+    Each heavy file gets a worker of its own; callers bound them to
+    `extraction_processes` at once by holding a `slot` while the file's
+    extraction runs. Idle workers are reused and recycled every
+    `extraction_tasks_per_worker` files. Workers get the spooled file's
+    path (or its bytes, for in-memory spools), have their address space
+    capped at `extraction_memory_mb`, and stream segments back as they are
+    extracted, a few segments ahead of the consumer. A file whose worker
+    makes no progress within its format's timeout (time spent waiting on
+    the worker, not on the consumer), or whose worker dies, fails alone:
+    only its worker is killed.
+    """
+
+    def __init__(self, config: KBConfig, extractors: ExtractorRegistry = None):
+        self.config = config
+        self.registry = extractors or registry
+        self.mode = config.extraction_mode
+        self.processes = config.extraction_processes or os.cpu_count() or 1
+        # spawn: the parent is multi-threaded, fork could deadlock
+        self._context = multiprocessing.get_context("spawn")
+        self._slots = asyncio.Semaphore(self.processes)
+        self._idle: List[_ExtractionWorker] = []
+        self._lock = threading.Lock()
+
+        if self.mode not in ("process", "thread"):
+            raise ValueError(f"Unknown extraction mode: {self.mode}")
+
+    @contextlib.asynccontextmanager
+    async def slot(self, file_type: str):
+        """
+        Hold a worker slot for the extraction of a file of this type, if it
+        runs in a worker process.
+
+        Taken on the event loop rather than in the threads that drive
+        iter_text: an extraction keeps its slot while paused between
+        segments, so a thread blocked waiting for one could starve the
+        extractions that hold them.
+        """
+        if self.registry.get(file_type).heavy and self.mode == "process":
+            async with self._slots:
+                yield
+        else:
+            yield
+
+    def iter_text(self, source: BinaryIO, file_type: str, filename: str) -> Iterator[Segment]:
+        """Yield the text of a file segment by segment (TableRows for spreadsheets)."""
+        extractor = self.registry.get(file_type)
+        if extractor.heavy and self.mode == "process":
+            yield from self._run_in_worker(extractor, source, filename)
+        else:
+            yield from extractor.fn(source, filename)
+
+    def _run_in_worker(self, extractor: Extractor, source: BinaryIO, filename: str) -> Iterator[Segment]:
+        path = getattr(source, 'name', None)
+        payload = path if isinstance(path, str) and os.path.exists(path) else source.read()
+        timeout = self.config.extraction_timeouts.get(extractor.file_type, extractor.timeout)
+
+        worker = self._checkout()
+        reusable = False
+        try:
+            worker.tasks.put((extractor.fn, payload, filename))
+            waited = 0.0
+            while True:
+                started = time.monotonic()
+                try:
+                    kind, value = worker.results.get(
+                        timeout=max(0.01, min(WORKER_POLL_SECONDS, timeout - waited))
+                    )
+                except queue.Empty:
+                    if worker.started:
+                        waited += time.monotonic() - started
+                    if not worker.process.is_alive():
+                        raise MemoryError(
+                            f"Extraction worker for {filename} died "
+                            f"(exit code {worker.process.exitcode}; memory cap?)"
+                        )
+                    if waited >= timeout:
+                        raise TimeoutError(f"Extraction of {filename} timed out after {timeout}s")
+                    continue
+
+                if kind == "ready":
+                    worker.started = True  # start-up time does not count
+                    continue
+                waited += time.monotonic() - started
+                if kind == "segment":
+                    yield value
+                    continue
+
+                # "done", or an error the worker survived and reported
+                reusable = True
+                if kind == "error":
+                    raise value
+                return
+        finally:
+            # A worker left mid-task (timeout, crash, consumer gave up) is killed
+            self._checkin(worker, reusable)
+
+    def _checkout(self) -> _ExtractionWorker:
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return _ExtractionWorker(self._context, self.config.extraction_memory_mb * 1024 * 1024)
+
+    def _checkin(self, worker: _ExtractionWorker, reusable: bool):
+        if reusable:
+            worker.completed += 1
+            limit = self.config.extraction_tasks_per_worker
+            if not limit or worker.completed < limit:
+                with self._lock:
+                    self._idle.append(worker)
+                return
+        worker.stop(kill=not reusable)
+
+    def shutdown(self):
+        """Stop the idle worker processes."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            worker.stop()
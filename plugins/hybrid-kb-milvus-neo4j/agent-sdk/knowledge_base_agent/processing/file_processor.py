@@ -4,19 +4,29 @@ File Processor - Document Processing Pipeline
 Processes uploaded files: extraction, chunking, embedding, indexing.
 """
 
-import io
+import asyncio
+import contextlib
 import hashlib
-from typing import List, Optional
+from typing import AsyncIterator, BinaryIO, Dict, Iterable, Iterator, List, Optional
 from uuid import UUID
 import uuid
 import logging
+from collections import defaultdict, deque
 from datetime import datetime
 
+from sqlalchemy import insert, update
+
 from ..core.config import KBConfig
-from ..core.models import DatabaseManager, KBFile, KBChunk, KnowledgeBase, FileStatus
-from ..storage import StorageManager
+from ..core.executors import get_executors
+from ..core.models import DatabaseManager, KBFile, KBChunk, KnowledgeBase, FileStatus, FileType
+from ..storage import StorageManager, ZipMember
 from .embeddings import EmbeddingService
 from .graph import GraphService
+from .chunking import Chunk, Segment, TableRows, TextChunker
+from .extractors import TextExtraction
+from .jobs import JobLease, JobStore, LeaseLost
+from .pipeline import Pipeline, Stage
+from .worker import IngestionStats
 
 logger = logging.getLogger(__name__)
 
@@ -24,6 +34,9 @@ logger = logging.getLogger(__name__)
 class FileProcessor:
     """Processes files through the complete ingestion pipeline."""
 
+    # Leading characters kept for the text preview and entity extraction
+    HEAD_CHARS = 5000
+
     def __init__(
         self,
         config: KBConfig,
@@ -37,17 +50,26 @@ class FileProcessor:
         self.embeddings = embeddings
         self.graph = graph
         self.db = db
+        self.executors = get_executors(config)
+        self.extraction = TextExtraction(config)
+        self.jobs = JobStore(db, config)
 
-    async def process_file(self, file_id: str) -> dict:
+    async def process_file(self, file_id: str, source: BinaryIO = None, job: JobLease = None) -> dict:
         """
         Process a file through the complete pipeline:
-        1. Download from Minio
+        1. Download from Minio (skipped when `source` already holds the content)
         2. Extract text
         3. Chunk text
         4. Generate embeddings
         5. Store in Milvus
         6. Create graph nodes in Neo4j
         7. Update PostgreSQL records
+
+        With a `job` lease (see IngestionWorker), every written chunk batch is
+        committed with a checkpoint, and a resumed job skips the chunks its
+        earlier attempts already committed. Without one, the file is claimed
+        here and skipped unless it is PENDING (or FAILED, to retry it: the
+        failed attempt's chunks are removed first).
         """
         session = self.db.get_session()
 
@@ -58,326 +80,887 @@ class FileProcessor:
                 return {"success": False, "error": "File not found"}
 
             kb = file.knowledge_base
-
-            # Update status
-            file.status = FileStatus.PROCESSING
+            # Read before the claim, which updates the loaded record's status
+            retry = job is None and file.status == FileStatus.FAILED
+
+            if job is None:
+                # Claim the file atomically, so the IngestionWorker cannot
+                # lease it while it is processed here (and vice versa)
+                claimed = session.execute(
+                    update(KBFile).where(
+                        KBFile.id == file.id,
+                        KBFile.status.in_([FileStatus.PENDING, FileStatus.FAILED])
+                    ).values(status=FileStatus.PROCESSING)
+                ).rowcount
+                if not claimed:
+                    session.rollback()
+                    return {
+                        "success": False,
+                        "skipped": True,
+                        "error": f"File is not pending (status: {file.status.value})"
+                    }
+            else:
+                # Already claimed by JobStore.claim
+                file.status = FileStatus.PROCESSING
             session.commit()
 
-            # Download file
-            content = self.storage.download_file(file.minio_object_key)
+            if retry and file.file_type.value != "zip":
+                # The failed attempt may have committed some chunk batches
+                await self._clear_output(file.id, kb, session)
 
-            # Handle ZIP files
-            if file.file_type.value == "zip":
-                return await self._process_zip(file, content, kb, session)
+            # Content already in hand (e.g. a ZIP member)
+            if source is not None:
+                return await self._ingest(file, kb, source, session, job)
+
+            # Download file (spooled to disk when large) on the Minio pool
+            source = await self.executors.run("minio", self.storage.download_to_spool, file.minio_object_key)
+            with source:
+                # Handle ZIP files
+                if file.file_type.value == "zip":
+                    return await self._process_zip(file, source, kb, session)
+
+                return await self._ingest(file, kb, source, session, job)
+
+        except LeaseLost:
+            # The job was re-queued; its new owner resumes it from the checkpoint
+            session.rollback()
+            raise
+
+        except Exception as e:
+            logger.error(f"File processing failed: {e}")
+            session.rollback()
+
+            # Update file status
+            try:
+                file = session.query(KBFile).filter(KBFile.id == UUID(file_id)).first()
+                if file:
+                    file.status = FileStatus.FAILED
+                    file.error_message = str(e)
+                    session.commit()
+            except:
+                pass
+
+            return {"success": False, "error": str(e)}
 
-            # Extract text
-            text = await self._extract_text(content, file.file_type.value, file.filename)
+        finally:
+            session.close()
 
-            if not text:
-                file.status = FileStatus.FAILED
-                file.error_message = "Could not extract text from file"
+    async def _ingest(
+        self,
+        file: KBFile,
+        kb: KnowledgeBase,
+        source: BinaryIO,
+        session,
+        job: JobLease = None
+    ) -> dict:
+        """Extract, chunk, embed and index a non-ZIP file read from `source`."""
+        resume_from = await self._prepare_resume(file, kb, job, session) if job else 0
+
+        # Extract and chunk text as a stream (pages/segments -> chunks).
+        # Chunking is deterministic, so a resumed job skips the chunks
+        # committed before its checkpoint without embedding them again.
+        head = []
+        segments = self._capture_head(
+            self._iter_text(source, file.file_type.value, file.filename),
+            head,
+            self.HEAD_CHARS
+        )
+        chunks = (chunk for chunk in self._chunker(kb).iter_chunks(segments) if chunk.index >= resume_from)
+        batches = self._batched(chunks, self.config.ingestion_batch_chunks)
+
+        # Staged pipeline: extract/chunk (thread) -> embed -> write (Neo4j + Milvus, then PostgreSQL)
+        counts = {"chunks": resume_from, "reused": 0}
+        document_ready = asyncio.Lock()
+        document_created = []
+
+        async def embed(batch: List[Chunk]) -> dict:
+            return await self._embed_chunk_batch(kb, batch, session)
+
+        async def write(embedded: dict):
+            async with document_ready:
+                if not document_created:
+                    # Create document node in Neo4j
+                    await self.graph.create_document_node(
+                        doc_id=str(file.id),
+                        kb_id=str(kb.id),
+                        filename=file.filename,
+                        metadata=file.metadata
+                    )
+                    document_created.append(True)
+
+            await self._write_chunk_batch(file, kb, embedded, session)
+            counts["chunks"] += len(embedded["chunks"])
+            counts["reused"] += embedded["reused"]
+
+            if job is not None:
+                # Commit the batch's chunk rows together with the checkpoint
+                written = embedded["chunks"]
+                job.record_batch(written[0].index, written[-1].index + 1, written[-1].end)
+                self.jobs.checkpoint(session, job)
                 session.commit()
-                return {"success": False, "error": "Text extraction failed"}
 
-            # Store preview
-            file.text_preview = text[:500]
+        pipeline = Pipeline(
+            self._read_extracted(batches, file.file_type.value),
+            [
+                Stage("embed", embed, self.config.pipeline_embed_workers),
+                Stage("write", write, self.config.pipeline_write_workers)
+            ],
+            queue_size=self.config.pipeline_queue_size,
+            name=f"ingest {file.filename}"
+        )
+        await pipeline.run()
+
+        chunk_count = counts["chunks"]
+        embeddings_reused = counts["reused"]
+        text_head = "".join(head)
+
+        if not chunk_count:
+            file.status = FileStatus.FAILED
+            file.error_message = "Could not extract text from file"
+            session.commit()
+            return {"success": False, "error": "Text extraction failed"}
 
-            # Chunk text
-            chunks = self._chunk_text(text, kb.chunk_size, kb.chunk_overlap)
+        # Store preview
+        file.text_preview = text_head[:500]
 
-            # Create document node in Neo4j
-            await self.graph.create_document_node(
-                doc_id=str(file.id),
-                kb_id=str(kb.id),
-                filename=file.filename,
-                metadata=file.metadata
-            )
+        # Extract entities
+        entities = await self.graph.extract_and_create_entities(
+            str(file.id),
+            text_head  # Limit for performance
+        )
+        entity_count = entities["count"]
 
-            # Process chunks
-            vectors_to_insert = []
-            chunk_records = []
+        # Update file record
+        file.status = FileStatus.COMPLETED
+        file.chunk_count = chunk_count
+        file.entity_count = entity_count
+        file.processed_at = datetime.utcnow()
 
-            for i, chunk_text in enumerate(chunks):
-                chunk_id = str(uuid.uuid4())
-                content_hash = hashlib.sha256(chunk_text.encode()).hexdigest()
+        # Update KB stats (SQL-side increments; several files may finish concurrently)
+        kb.file_count = KnowledgeBase.file_count + 1
+        kb.chunk_count = KnowledgeBase.chunk_count + chunk_count
+        kb.total_size_bytes = KnowledgeBase.total_size_bytes + file.size_bytes
 
-                # Generate embedding
-                embedding = await self.embeddings.generate_embedding(
-                    chunk_text,
-                    kb.embedding_provider
-                )
+        session.commit()
 
-                # Prepare vector for Milvus
-                milvus_id = f"{file_id}_{i}"
-                vectors_to_insert.append({
-                    "id": milvus_id,
-                    "vector": embedding,
-                    "text": chunk_text,
-                    "file_id": str(file.id),
-                    "kb_id": str(kb.id),
-                    "chunk_index": i,
-                    "metadata": {"filename": file.filename}
-                })
+        logger.info(
+            f"Processed file {file.filename}: {chunk_count} chunks, {entity_count} entities, "
+            f"{embeddings_reused} embeddings reused"
+        )
 
-                # Create chunk node in Neo4j
-                await self.graph.create_chunk_node(
-                    chunk_id=chunk_id,
-                    doc_id=str(file.id),
-                    content=chunk_text,
-                    chunk_index=i,
-                    milvus_id=milvus_id
-                )
+        return {
+            "success": True,
+            "file_id": str(file.id),
+            "chunks_created": chunk_count,
+            "entities_extracted": entity_count,
+            "entities_created": entities["created"],
+            "embeddings_reused": embeddings_reused,
+            "resumed_from_chunk": resume_from,
+            "pipeline": pipeline.stats()
+        }
 
-                # Create chunk record
-                chunk_record = KBChunk(
-                    id=UUID(chunk_id),
-                    file_id=file.id,
-                    chunk_index=i,
-                    content=chunk_text,
-                    content_hash=content_hash,
-                    milvus_id=milvus_id,
-                    neo4j_node_id=chunk_id
-                )
-                chunk_records.append(chunk_record)
+    async def _prepare_resume(self, file: KBFile, kb: KnowledgeBase, job: JobLease, session) -> int:
+        """
+        Chunk index a leased job resumes from.
 
-            # Insert vectors into Milvus
-            await self.embeddings.insert_vectors(kb.milvus_collection, vectors_to_insert)
+        A checkpoint made with other chunking settings is discarded. On a
+        retry, whatever the previous attempt wrote past the checkpoint is
+        removed first (its chunk rows may have been committed by a later
+        batch, and its Neo4j nodes and Milvus rows are not transactional).
+        """
+        key = self._checkpoint_key(kb)
+        if job.checkpoint_key != key:
+            job.checkpoint_chunks = job.checkpoint_offset = 0
+            job.checkpoint_key = key
+
+        resume_from = job.checkpoint_chunks
+        if job.attempts > 1:
+            await self._clear_output(file.id, kb, session, from_index=resume_from)
+
+        if resume_from:
+            logger.info(
+                f"Resuming {file.filename} (attempt {job.attempts}) from chunk {resume_from}, "
+                f"offset {job.checkpoint_offset}"
+            )
+        return resume_from
+
+    async def _clear_output(self, file_id: UUID, kb: KnowledgeBase, session, from_index: int = 0):
+        """Delete a file's chunk rows, graph chunk nodes and vectors from chunk `from_index` on."""
+        session.query(KBChunk).filter(
+            KBChunk.file_id == file_id,
+            KBChunk.chunk_index >= from_index
+        ).delete(synchronize_session=False)
+        session.commit()
 
-            # Extract entities
-            entity_count = await self.graph.extract_and_create_entities(
-                str(file.id),
-                text[:5000]  # Limit for performance
+        await asyncio.gather(
+            self.graph.delete_chunk_nodes_from(str(file_id), from_index),
+            self.embeddings.delete_file_vectors(
+                kb.vector_collection, str(file_id), from_index, kb_id=kb.partition_key
             )
+        )
+
+    @staticmethod
+    def _checkpoint_key(kb: KnowledgeBase) -> str:
+        """Settings that determine chunk boundaries and vectors; checkpoints are only valid for the same ones."""
+        return f"{kb.chunk_size}:{kb.chunk_overlap}:{kb.chunk_unit or 'chars'}:{kb.embedding_provider}"
+
+    async def _store_chunk_batch(
+        self,
+        file: KBFile,
+        kb: KnowledgeBase,
+        chunks: List[Chunk],
+        session,
+        unique_ids: bool = False
+    ) -> int:
+        """
+        Embed a window of chunks and write it to Milvus, Neo4j and the
+        session. Returns the number of embeddings reused.
+        """
+        embedded = await self._embed_chunk_batch(kb, chunks, session)
+        await self._write_chunk_batch(file, kb, embedded, session, unique_ids=unique_ids)
+        return embedded["reused"]
+
+    async def _embed_chunk_batch(self, kb: KnowledgeBase, chunks: List[Chunk], session) -> dict:
+        """
+        Compute content hashes and vectors for a window of chunks.
+
+        Chunks whose content hash already exists in the KB (same provider)
+        reuse the stored vector instead of being re-embedded; `reused` counts
+        the embeddings saved that way.
+        """
+        hashes = [hashlib.sha256(chunk.text.encode()).hexdigest() for chunk in chunks]
 
-            # Save chunk records
-            session.add_all(chunk_records)
+        vectors = {}
+        if self.config.dedup_embeddings:
+            vectors = await self._find_existing_vectors(kb, hashes, session)
 
-            # Update file record
+        # Embed each distinct new content once (batched, order preserved)
+        to_embed = {}
+        for chunk, content_hash in zip(chunks, hashes):
+            if content_hash not in vectors:
+                to_embed.setdefault(content_hash, chunk.text)
+
+        embeddings = await self.embeddings.generate_embeddings(
+            list(to_embed.values()),
+            kb.embedding_provider
+        )
+        vectors.update(zip(to_embed.keys(), embeddings))
+
+        return {
+            "chunks": chunks,
+            "hashes": hashes,
+            "vectors": vectors,
+            "reused": len(chunks) - len(to_embed)
+        }
+
+    async def _write_chunk_batch(
+        self,
+        file: KBFile,
+        kb: KnowledgeBase,
+        embedded: dict,
+        session,
+        unique_ids: bool = False
+    ):
+        """
+        Write an embedded window to Neo4j and Milvus (concurrently), then add
+        its chunk rows to the session.
+
+        With `unique_ids`, Milvus IDs are derived from the chunk ID instead of
+        the index, so they cannot clash with rows of the file that are being
+        kept (see replace_file).
+        """
+        vectors = embedded["vectors"]
+        vectors_to_insert = []
+        chunk_nodes = []
+        chunk_rows = []
+
+        for chunk, content_hash in zip(embedded["chunks"], embedded["hashes"]):
+            chunk_id = str(uuid.uuid4())
+            i, chunk_text = chunk.index, chunk.text
+
+            # Prepare vector for Milvus
+            milvus_id = f"{file.id}_{chunk_id}" if unique_ids else f"{file.id}_{i}"
+            vectors_to_insert.append({
+                "id": milvus_id,
+                "vector": vectors[content_hash],
+                "text": chunk_text,
+                "file_id": str(file.id),
+                "kb_id": str(kb.id),
+                "chunk_index": i,
+                "metadata": {"filename": file.filename}
+            })
+
+            # Prepare chunk node for Neo4j
+            chunk_nodes.append({
+                "id": chunk_id,
+                "content": chunk_text,
+                "chunk_index": i,
+                "milvus_id": milvus_id
+            })
+
+            # Prepare chunk row for PostgreSQL
+            chunk_rows.append({
+                "id": UUID(chunk_id),
+                "file_id": file.id,
+                "knowledge_base_id": kb.id,
+                "embedding_provider": kb.embedding_provider,
+                "chunk_index": i,
+                "content": chunk_text,
+                "content_hash": content_hash,
+                "start_offset": chunk.start,
+                "end_offset": chunk.end,
+                "milvus_id": milvus_id,
+                "neo4j_node_id": chunk_id,
+                "metadata": {}
+            })
+
+        # Chunk nodes in Neo4j (one UNWIND per batch) and vectors in Milvus
+        # (upsert: index-based IDs make re-runs idempotent)
+        await asyncio.gather(
+            self.graph.create_chunk_nodes(str(file.id), chunk_nodes),
+            self.embeddings.insert_vectors(kb.vector_collection, vectors_to_insert, upsert=not unique_ids)
+        )
+
+        self._insert_chunk_rows(chunk_rows, session)
+
+    def _insert_chunk_rows(self, rows: List[dict], session):
+        """
+        Bulk-insert chunk rows with Core executemany, bypassing the ORM unit of
+        work (no identity map entries, no per-row INSERTs).
+
+        Runs in the session's transaction, so rows commit or roll back with
+        the file.
+        """
+        batch_size = self.config.chunk_insert_batch_size
+        for start in range(0, len(rows), batch_size):
+            session.execute(insert(KBChunk.__table__), rows[start:start + batch_size])
+
+    async def _find_existing_vectors(
+        self,
+        kb: KnowledgeBase,
+        hashes: List[str],
+        session
+    ) -> Dict[str, List[float]]:
+        """Look up stored vectors for chunk hashes already embedded in this KB."""
+        rows = session.query(KBChunk.content_hash, KBChunk.milvus_id).filter(
+            KBChunk.knowledge_base_id == kb.id,
+            KBChunk.embedding_provider == kb.embedding_provider,
+            KBChunk.content_hash.in_(set(hashes)),
+            KBChunk.milvus_id.isnot(None)
+        ).all()
+
+        milvus_ids = {}
+        for content_hash, milvus_id in rows:
+            milvus_ids.setdefault(content_hash, milvus_id)
+
+        if not milvus_ids:
+            return {}
+
+        stored = await self.embeddings.get_vectors(kb.vector_collection, list(milvus_ids.values()))
+        return {
+            content_hash: stored[milvus_id]
+            for content_hash, milvus_id in milvus_ids.items()
+            if milvus_id in stored
+        }
+
+    async def replace_file(
+        self,
+        file_id: str,
+        source: BinaryIO,
+        size_bytes: int = None,
+        object_key: str = None
+    ) -> dict:
+        """
+        Re-ingest a revised version of a file, touching only changed chunks.
+
+        The new content is re-chunked and diffed by content hash against the
+        file's existing chunks: unchanged chunks are kept (their chunk_index and
+        offsets are updated in place when they moved), new chunks are embedded
+        and written,
+        and chunks that no longer appear are deleted from Milvus, Neo4j and
+        PostgreSQL.
+
+        `object_key` (where the new content is stored) becomes the file's
+        object key in the same commit that completes the replacement.
+
+        Only COMPLETED or FAILED files are replaced; the file is claimed
+        like in process_file, and skipped while it is pending or being
+        processed.
+        """
+        session = self.db.get_session()
+
+        try:
+            file = session.query(KBFile).filter(KBFile.id == UUID(file_id)).first()
+            if not file:
+                return {"success": False, "error": "File not found"}
+            if file.file_type.value == "zip":
+                return {"success": False, "error": "ZIP files cannot be replaced in place"}
+
+            kb = file.knowledge_base
+            # A failed file is not counted in the KB stats yet
+            counted = file.status == FileStatus.COMPLETED
+
+            claimed = session.execute(
+                update(KBFile).where(
+                    KBFile.id == file.id,
+                    KBFile.status.in_([FileStatus.COMPLETED, FileStatus.FAILED])
+                ).values(status=FileStatus.PROCESSING)
+            ).rowcount
+            if not claimed:
+                session.rollback()
+                return {
+                    "success": False,
+                    "skipped": True,
+                    "error": f"File cannot be replaced now (status: {file.status.value})"
+                }
+            session.commit()
+
+            # Existing chunks, grouped by hash in document order
+            existing = defaultdict(deque)
+            for row in session.query(
+                KBChunk.id, KBChunk.chunk_index, KBChunk.content_hash, KBChunk.milvus_id,
+                KBChunk.start_offset, KBChunk.end_offset
+            ).filter(KBChunk.file_id == file.id).order_by(KBChunk.chunk_index):
+                existing[row.content_hash].append(row)
+            old_count = sum(len(rows) for rows in existing.values())
+
+            head = []
+            segments = self._capture_head(
+                self._iter_text(source, file.file_type.value, file.filename),
+                head,
+                self.HEAD_CHARS
+            )
+            batches = self._batched(self._chunker(kb).iter_chunks(segments), self.config.ingestion_batch_chunks)
+
+            moved = []
+            shifted = []
+            new_chunks = []
+            chunk_count = 0
+            embeddings_reused = 0
+            added = 0
+
+            reader = self._read_extracted(batches, file.file_type.value)
+            async with contextlib.aclosing(reader):
+                async for batch in reader:
+                    for chunk in batch:
+                        chunk_count += 1
+                        content_hash = hashlib.sha256(chunk.text.encode()).hexdigest()
+                        if existing.get(content_hash):
+                            row = existing[content_hash].popleft()
+                            if row.chunk_index != chunk.index:
+                                moved.append((row, chunk.index))
+                            position = (chunk.index, chunk.start, chunk.end)
+                            if (row.chunk_index, row.start_offset, row.end_offset) != position:
+                                shifted.append({
+                                    "id": row.id,
+                                    "chunk_index": chunk.index,
+                                    "start_offset": chunk.start,
+                                    "end_offset": chunk.end
+                                })
+                            continue
+
+                        new_chunks.append(chunk)
+                        if len(new_chunks) >= self.config.ingestion_batch_chunks:
+                            embeddings_reused += await self._store_chunk_batch(
+                                file, kb, new_chunks, session, unique_ids=True
+                            )
+                            added += len(new_chunks)
+                            new_chunks = []
+
+            if not chunk_count:
+                raise ValueError("Could not extract text from file")
+
+            if new_chunks:
+                embeddings_reused += await self._store_chunk_batch(
+                    file, kb, new_chunks, session, unique_ids=True
+                )
+                added += len(new_chunks)
+
+            # Renumber kept chunks whose position changed
+            if shifted:
+                session.execute(update(KBChunk), shifted)
+            if moved:
+                await self.graph.update_chunk_indexes([
+                    {"id": str(row.id), "chunk_index": index} for row, index in moved
+                ])
+                await self.embeddings.update_chunk_indexes(kb.vector_collection, {
+                    row.milvus_id: index for row, index in moved if row.milvus_id
+                })
+
+            # Remove chunks that no longer appear
+            removed = [row for rows in existing.values() for row in rows]
+            if removed:
+                milvus_ids = [row.milvus_id for row in removed if row.milvus_id]
+                if milvus_ids:
+                    await self.embeddings.delete_vectors(kb.vector_collection, milvus_ids, kb_id=kb.partition_key)
+                await self.graph.delete_chunk_nodes([str(row.id) for row in removed])
+                session.query(KBChunk).filter(
+                    KBChunk.id.in_([row.id for row in removed])
+                ).delete(synchronize_session=False)
+
+            text_head = "".join(head)
+            file.text_preview = text_head[:500]
+            entities = await self.graph.extract_and_create_entities(str(file.id), text_head)
+            entity_count = entities["count"]
+
+            # Update file record and KB stats
+            old_size = file.size_bytes or 0
+            if size_bytes is not None:
+                file.size_bytes = size_bytes
+            if object_key is not None:
+                file.minio_object_key = object_key
             file.status = FileStatus.COMPLETED
-            file.chunk_count = len(chunks)
+            file.error_message = None
+            file.chunk_count = chunk_count
             file.entity_count = entity_count
             file.processed_at = datetime.utcnow()
 
-            # Update KB stats
-            kb.file_count += 1
-            kb.chunk_count += len(chunks)
-            kb.total_size_bytes += file.size_bytes
+            if counted:
+                kb.chunk_count = KnowledgeBase.chunk_count + (chunk_count - old_count)
+                kb.total_size_bytes = KnowledgeBase.total_size_bytes + (file.size_bytes - old_size)
+            else:
+                kb.file_count = KnowledgeBase.file_count + 1
+                kb.chunk_count = KnowledgeBase.chunk_count + chunk_count
+                kb.total_size_bytes = KnowledgeBase.total_size_bytes + file.size_bytes
 
             session.commit()
 
-            logger.info(f"Processed file {file.filename}: {len(chunks)} chunks, {entity_count} entities")
+            logger.info(
+                f"Replaced file {file.filename}: {added} added, {len(removed)} removed, "
+                f"{len(moved)} moved, {chunk_count - added - len(moved)} unchanged"
+            )
 
             return {
                 "success": True,
                 "file_id": str(file.id),
-                "chunks_created": len(chunks),
+                "chunks_total": chunk_count,
+                "chunks_added": added,
+                "chunks_removed": len(removed),
+                "chunks_moved": len(moved),
+                "embeddings_reused": embeddings_reused,
                 "entities_extracted": entity_count
             }
 
         except Exception as e:
-            logger.error(f"File processing failed: {e}")
+            logger.error(f"File replacement failed: {e}")
             session.rollback()
 
-            # Update file status
             try:
                 file = session.query(KBFile).filter(KBFile.id == UUID(file_id)).first()
                 if file:
                     file.status = FileStatus.FAILED
                     file.error_message = str(e)
                     session.commit()
-            except:
-                pass
+            except Exception as status_error:
+                logger.error(f"Failed to mark file {file_id} as failed: {status_error}")
 
             return {"success": False, "error": str(e)}
 
         finally:
             session.close()
 
-    async def _process_zip(self, file: KBFile, content: bytes, kb: KnowledgeBase, session) -> dict:
-        """Process a ZIP file by extracting and processing each file."""
-        # Save ZIP to Minio first if not already there
-        extracted = self.storage.extract_zip(file.minio_object_key)
+    async def process_files(self, file_ids: List[str], concurrency: int = None) -> dict:
+        """
+        Process several files concurrently, at most `concurrency` at a time.
 
-        total_chunks = 0
-        total_entities = 0
-        processed_files = 0
-        errors = []
+        Each file gets its own DB session. Returns aggregate throughput
+        (files/s, chunks/s) plus the per-file results.
+        """
+        semaphore = asyncio.Semaphore(max(1, concurrency or self.config.ingestion_concurrency))
+        stats = IngestionStats()
 
-        for filename, file_content, mime_type in extracted:
-            try:
-                # Determine file type
-                ext = filename.lower().split('.')[-1] if '.' in filename else 'other'
+        async def process(file_id: str) -> dict:
+            async with semaphore:
+                result = await self.process_file(file_id)
+                stats.record(result)
+                return result
 
-                # Skip unsupported files
-                if ext not in ['pdf', 'docx', 'xlsx', 'pptx', 'txt', 'md', 'csv', 'json', 'html']:
-                    continue
+        results = await asyncio.gather(*(process(file_id) for file_id in file_ids))
 
-                # Create child file record
-                from ..core.models import FileType
-                file_type = FileType(ext) if ext in [e.value for e in FileType] else FileType.OTHER
+        summary = stats.as_dict()
+        logger.info(f"Processed {len(file_ids)} files: {summary}")
+        summary["results"] = dict(zip(file_ids, results))
+        return summary
 
-                child_file = KBFile(
-                    knowledge_base_id=kb.id,
-                    filename=filename,
-                    original_filename=filename,
-                    file_type=file_type,
-                    mime_type=mime_type,
-                    size_bytes=len(file_content),
-                    status=FileStatus.PENDING,
-                    parent_file_id=file.id,
-                    is_from_zip=True
-                )
+    async def _process_zip(self, file: KBFile, source: BinaryIO, kb: KnowledgeBase, session) -> dict:
+        """
+        Process a ZIP file by fanning its members out to a bounded pool.
 
-                session.add(child_file)
-                session.flush()
+        At most `config.zip_member_concurrency` members are in flight; each one
+        creates its child record and is processed in its own DB session. The
+        parent's chunk/entity counts are updated as children finish.
 
-                # Upload to Minio
-                object_key = f"{file.minio_object_key.rsplit('/', 1)[0]}/extracted/{child_file.id}/{filename}"
-                self.storage.upload_file(object_key, file_content)
-                child_file.minio_object_key = object_key
+        When the ZIP is processed again (a resumed or retried job), members
+        are matched to the children of earlier attempts by name: completed
+        children are kept as they are, the others are cleared and processed
+        again in place.
+        """
+        semaphore = asyncio.Semaphore(max(1, self.config.zip_member_concurrency))
+
+        previous = defaultdict(deque)
+        for child in session.query(
+            KBFile.id, KBFile.filename, KBFile.status, KBFile.chunk_count, KBFile.entity_count
+        ).filter(KBFile.parent_file_id == file.id).order_by(KBFile.created_at):
+            previous[child.filename].append(child)
+        progress = {"extracted": 0, "finished": 0, "processed": 0, "chunks": 0, "entities": 0, "reused": 0}
+        errors = []
 
+        async def process_member(member: ZipMember, file_type: FileType, child):
+            try:
+                if child is not None and child.status == FileStatus.COMPLETED:
+                    result = {
+                        "success": True,
+                        "chunks_created": child.chunk_count or 0,
+                        "entities_extracted": child.entity_count or 0
+                    }
+                else:
+                    result = await self._process_zip_member(file, kb, member, file_type, child)
+            except Exception as e:
+                result = {"success": False, "error": str(e)}
+            finally:
+                semaphore.release()
+
+            progress["finished"] += 1
+            if result.get("success"):
+                progress["processed"] += 1
+                progress["chunks"] += result.get("chunks_created", 0)
+                progress["entities"] += result.get("entities_extracted", 0)
+                progress["reused"] += result.get("embeddings_reused", 0)
+                file.chunk_count = progress["chunks"]
+                file.entity_count = progress["entities"]
                 session.commit()
+            else:
+                errors.append(f"{member.filename}: {result.get('error')}")
 
-                # Process the extracted file
-                result = await self.process_file(str(child_file.id))
-
-                if result.get("success"):
-                    processed_files += 1
-                    total_chunks += result.get("chunks_created", 0)
-                    total_entities += result.get("entities_extracted", 0)
-                else:
-                    errors.append(f"{filename}: {result.get('error')}")
+            logger.info(
+                f"ZIP {file.filename}: {progress['finished']}/{progress['extracted']} members done "
+                f"({member.filename}: {'ok' if result.get('success') else 'failed'})"
+            )
 
-            except Exception as e:
-                errors.append(f"{filename}: {str(e)}")
+        tasks = []
+        with self.storage.open_zip_members(source) as members:
+            try:
+                for member in members:
+                    progress["extracted"] += 1
+
+                    # Skip unsupported files
+                    file_type = self._zip_member_type(member.filename)
+                    if file_type is None:
+                        continue
+
+                    # Bound members in flight (and the memory they hold)
+                    await semaphore.acquire()
+                    child = previous[member.filename].popleft() if previous.get(member.filename) else None
+                    tasks.append(asyncio.create_task(process_member(member, file_type, child)))
+
+                await asyncio.gather(*tasks)
+            finally:
+                # Members read from the archive: none may outlive it
+                unfinished = [task for task in tasks if not task.done()]
+                for task in unfinished:
+                    task.cancel()
+                await asyncio.gather(*unfinished, return_exceptions=True)
 
         # Update parent file status
         file.status = FileStatus.COMPLETED
-        file.chunk_count = total_chunks
-        file.entity_count = total_entities
+        file.chunk_count = progress["chunks"]
+        file.entity_count = progress["entities"]
         file.processed_at = datetime.utcnow()
         session.commit()
 
         return {
             "success": True,
             "file_id": str(file.id),
-            "files_extracted": len(extracted),
-            "files_processed": processed_files,
-            "total_chunks": total_chunks,
-            "total_entities": total_entities,
+            "files_extracted": progress["extracted"],
+            "files_processed": progress["processed"],
+            "total_chunks": progress["chunks"],
+            "total_entities": progress["entities"],
+            "embeddings_reused": progress["reused"],
             "errors": errors if errors else None
         }
 
-    async def _extract_text(self, content: bytes, file_type: str, filename: str) -> str:
-        """Extract text from file content."""
-        try:
-            if file_type in ['txt', 'md', 'csv']:
-                return content.decode('utf-8', errors='ignore')
-
-            elif file_type == 'json':
-                import json
-                data = json.loads(content.decode('utf-8'))
-                return json.dumps(data, indent=2)
-
-            elif file_type == 'html':
-                from html.parser import HTMLParser
-
-                class TextExtractor(HTMLParser):
-                    def __init__(self):
-                        super().__init__()
-                        self.text = []
-
-                    def handle_data(self, data):
-                        self.text.append(data.strip())
-
-                parser = TextExtractor()
-                parser.feed(content.decode('utf-8', errors='ignore'))
-                return ' '.join(parser.text)
-
-            elif file_type == 'pdf':
-                try:
-                    import pymupdf
-                    doc = pymupdf.open(stream=content, filetype="pdf")
-                    text = ""
-                    for page in doc:
-                        text += page.get_text()
-                    doc.close()
-                    return text
-                except ImportError:
-                    logger.warning("pymupdf not installed, using fallback")
-                    return f"[PDF content from {filename}]"
-
-            elif file_type == 'docx':
-                try:
-                    from docx import Document
-                    doc = Document(io.BytesIO(content))
-                    return '\n'.join([para.text for para in doc.paragraphs])
-                except ImportError:
-                    logger.warning("python-docx not installed")
-                    return f"[DOCX content from {filename}]"
-
-            elif file_type == 'xlsx':
-                try:
-                    import openpyxl
-                    wb = openpyxl.load_workbook(io.BytesIO(content), data_only=True)
-                    text = []
-                    for sheet in wb.worksheets:
-                        for row in sheet.iter_rows(values_only=True):
-                            text.append(' | '.join(str(c) for c in row if c))
-                    return '\n'.join(text)
-                except ImportError:
-                    logger.warning("openpyxl not installed")
-                    return f"[XLSX content from {filename}]"
-
-            elif file_type == 'pptx':
-                try:
-                    from pptx import Presentation
-                    prs = Presentation(io.BytesIO(content))
-                    text = []
-                    for slide in prs.slides:
-                        for shape in slide.shapes:
-                            if hasattr(shape, "text"):
-                                text.append(shape.text)
-                    return '\n'.join(text)
-                except ImportError:
-                    logger.warning("python-pptx not installed")
-                    return f"[PPTX content from {filename}]"
+    async def _process_zip_member(
+        self,
+        parent: KBFile,
+        kb: KnowledgeBase,
+        member: ZipMember,
+        file_type: FileType,
+        previous=None
+    ) -> dict:
+        """
+        Create the child record for a ZIP member and process it.
 
+        `previous` is the member's unfinished child from an earlier attempt;
+        its output is cleared and the record is reused.
+
+        The member is spooled locally and handed straight to extraction; its
+        upload to Minio runs concurrently in a background thread instead of
+        being downloaded back by process_file. If the upload fails, the
+        member fails as a whole (see _fail_zip_member).
+        """
+        session = self.db.get_session()
+        try:
+            if previous is not None:
+                child_file = session.query(KBFile).filter(KBFile.id == previous.id).one()
+                await self._clear_output(child_file.id, kb, session)
+                child_file.status = FileStatus.PENDING
+                child_file.error_message = None
             else:
-                return content.decode('utf-8', errors='ignore')
+                child_file = KBFile(
+                    knowledge_base_id=kb.id,
+                    filename=member.filename,
+                    original_filename=member.filename,
+                    file_type=file_type,
+                    mime_type=member.mime_type,
+                    size_bytes=member.size_bytes,
+                    status=FileStatus.PENDING,
+                    parent_file_id=parent.id,
+                    is_from_zip=True
+                )
+
+                session.add(child_file)
+                session.flush()
 
+            object_key = f"{parent.minio_object_key.rsplit('/', 1)[0]}/extracted/{child_file.id}/{member.filename}"
+            child_file.minio_object_key = object_key
+
+            session.commit()
+            child_id = str(child_file.id)
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+        # Write-behind upload from a separate member stream
+        upload = asyncio.create_task(
+            self.executors.run("minio", self._upload_zip_member, object_key, member)
+        )
+
+        try:
+            source = await self.executors.run("extract", self._spool_zip_member, member)
+            with source:
+                result = await self.process_file(child_id, source=source)
+        finally:
+            try:
+                await upload
+            except Exception as e:
+                logger.error(f"Upload of ZIP member {member.filename} failed: {e}")
+                result = {"success": False, "error": f"Upload failed: {e}"}
+                await self._fail_zip_member(child_id, kb, result["error"])
+
+        return result
+
+    def _spool_zip_member(self, member: ZipMember) -> BinaryIO:
+        with member.open() as stream:
+            return self.storage.stream_to_spool(stream, member.size_bytes)
+
+    def _upload_zip_member(self, object_key: str, member: ZipMember):
+        with member.open() as stream:
+            self.storage.upload_stream(object_key, stream, member.size_bytes, member.mime_type)
+
+    async def _fail_zip_member(self, file_id: str, kb: KnowledgeBase, error: str):
+        """
+        Mark a ZIP member whose upload failed FAILED, and remove whatever was
+        indexed for it: a file without stored content must not be searchable.
+        """
+        session = self.db.get_session()
+        try:
+            file = session.query(KBFile).filter(KBFile.id == UUID(file_id)).one()
+            if file.status == FileStatus.COMPLETED:
+                # Undo _ingest's KB stats
+                session.query(KnowledgeBase).filter(KnowledgeBase.id == kb.id).update({
+                    KnowledgeBase.file_count: KnowledgeBase.file_count - 1,
+                    KnowledgeBase.chunk_count: KnowledgeBase.chunk_count - (file.chunk_count or 0),
+                    KnowledgeBase.total_size_bytes: KnowledgeBase.total_size_bytes - (file.size_bytes or 0)
+                }, synchronize_session=False)
+
+            file.status = FileStatus.FAILED
+            file.error_message = error
+            file.minio_object_key = None
+            file.chunk_count = 0
+            file.entity_count = 0
+            session.commit()
+
+            await self._clear_output(file.id, kb, session)
+            await self.graph.delete_file_nodes(file_id)
         except Exception as e:
-            logger.error(f"Text extraction error: {e}")
-            return ""
+            session.rollback()
+            logger.error(f"Failed to clean up ZIP member {file_id}: {e}")
+        finally:
+            session.close()
 
-    def _chunk_text(
-        self,
-        text: str,
-        chunk_size: int = 512,
-        overlap: int = 50
-    ) -> List[str]:
-        """Split text into chunks with overlap."""
-        if not text:
-            return []
-
-        # Split by sentences
-        import re
-        sentences = re.split(r'(?<=[.!?])\s+', text)
-
-        chunks = []
-        current_chunk = ""
-
-        for sentence in sentences:
-            if len(current_chunk) + len(sentence) < chunk_size:
-                current_chunk += sentence + " "
-            else:
-                if current_chunk:
-                    chunks.append(current_chunk.strip())
-                # Start new chunk with overlap
-                overlap_text = current_chunk[-overlap:] if len(current_chunk) > overlap else ""
-                current_chunk = overlap_text + sentence + " "
+    @staticmethod
+    def _zip_member_type(filename: str) -> Optional[FileType]:
+        """File type of a ZIP member, or None if the format is not ingested."""
+        ext = filename.lower().split('.')[-1] if '.' in filename else 'other'
+        if ext not in ['pdf', 'docx', 'xlsx', 'pptx', 'txt', 'md', 'csv', 'json', 'html']:
+            return None
+        return FileType(ext)
+
+    def _iter_text(self, source: BinaryIO, file_type: str, filename: str) -> Iterator[Segment]:
+        """
+        Yield the text of a file segment by segment (TableRows for spreadsheets).
 
-        if current_chunk.strip():
-            chunks.append(current_chunk.strip())
+        `source` is a seekable binary file (see StorageManager.download_spooled).
+        Extraction is delegated to the registered extractor for the file type
+        (see processing.extractors); heavy formats run in the extraction
+        process pool.
+        """
+        return self.extraction.iter_text(source, file_type, filename)
 
-        return chunks if chunks else [text[:chunk_size]]
+    async def _read_extracted(self, items: Iterator, file_type: str) -> AsyncIterator:
+        """
+        Pull items from a blocking iterator over extracted text (chunk
+        batches, say) on the "extract" pool, holding the file type's
+        extraction slot until the iterator is exhausted or abandoned.
+        """
+        async with self.extraction.slot(file_type):
+            pending = None
+            try:
+                while True:
+                    # Shielded: if the consumer goes away, the thread still runs to the end of next()
+                    pending = asyncio.ensure_future(self.executors.run("extract", next, items, None))
+                    item = await asyncio.shield(pending)
+                    pending = None
+                    if item is None:
+                        return
+                    yield item
+            finally:
+                if pending is not None:
+                    await asyncio.wait([pending])
+                # Stops an unfinished extraction (and its worker) before the slot is released
+                if hasattr(items, "close"):
+                    await self.executors.run("extract", items.close)
+
+    @staticmethod
+    def _chunker(kb: KnowledgeBase) -> TextChunker:
+        """Chunker configured with the KB's chunk size, overlap and unit."""
+        return TextChunker(kb.chunk_size, kb.chunk_overlap, kb.chunk_unit or "chars")
+
+    @staticmethod
+    def _segment_text(segment: Segment) -> str:
+        """Plain text of an extracted segment."""
+        return segment.text() + "\n" if isinstance(segment, TableRows) else segment
+
+    @classmethod
+    def _capture_head(cls, segments: Iterable[Segment], head: List[str], limit: int) -> Iterator[Segment]:
+        """Pass segments through while keeping the first `limit` characters in `head`."""
+        size = 0
+        for segment in segments:
+            if size < limit:
+                head.append(cls._segment_text(segment)[:limit - size])
+                size += len(head[-1])
+            yield segment
+
+    @staticmethod
+    def _batched(items: Iterable, size: int) -> Iterator[list]:
+        """Group an iterable into lists of at most `size` items."""
+        batch = []
+        for item in items:
+            batch.append(item)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
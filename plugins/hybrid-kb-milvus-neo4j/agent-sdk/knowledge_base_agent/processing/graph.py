@@ -10,12 +10,21 @@ import json
 from neo4j import GraphDatabase
 
 from ..core.config import KBConfig
+from ..core.executors import get_executors, run_blocking
 
 logger = logging.getLogger(__name__)
 
 
 class GraphService:
-    """Manages Neo4j knowledge graph operations."""
+    """
+    Manages Neo4j knowledge graph operations.
+
+    Driver calls are blocking; the async methods run them on the "neo4j"
+    thread pool (see core.executors).
+    """
+
+    # Rows per UNWIND statement for bulk writes
+    CHUNK_WRITE_BATCH = 1000
 
     def __init__(self, config: KBConfig):
         self.config = config
@@ -24,6 +33,7 @@ class GraphService:
             auth=(config.neo4j_user, config.neo4j_pass)
         )
         self.database = config.neo4j_database
+        get_executors(config)  # size the thread pools from this config on first use
         self._ensure_indexes()
 
     def _ensure_indexes(self):
@@ -35,11 +45,17 @@ class GraphService:
                 session.run("CREATE INDEX kb_chunk_id IF NOT EXISTS FOR (c:Chunk) ON (c.id)")
                 session.run("CREATE INDEX kb_entity_name IF NOT EXISTS FOR (e:Entity) ON (e.name)")
                 session.run("CREATE INDEX kb_kb_id IF NOT EXISTS FOR (k:KnowledgeBase) ON (k.id)")
-                logger.info("Neo4j indexes verified")
+                # Entities are unique per knowledge base
+                session.run(
+                    "CREATE CONSTRAINT kb_entity_unique IF NOT EXISTS "
+                    "FOR (e:Entity) REQUIRE (e.kb_id, e.name) IS UNIQUE"
+                )
+                logger.info("Neo4j indexes and constraints verified")
         except Exception as e:
             logger.warning(f"Could not create indexes: {e}")
 
-    async def create_document_node(
+    @run_blocking("neo4j")
+    def create_document_node(
         self,
         doc_id: str,
         kb_id: str,
@@ -63,7 +79,8 @@ class GraphService:
             record = result.single()
             return record["id"] if record else None
 
-    async def create_chunk_node(
+    @run_blocking("neo4j")
+    def create_chunk_node(
         self,
         chunk_id: str,
         doc_id: str,
@@ -88,29 +105,139 @@ class GraphService:
             record = result.single()
             return record["id"] if record else None
 
+    @run_blocking("neo4j")
+    def create_chunk_nodes(
+        self,
+        doc_id: str,
+        chunks: List[dict]
+    ) -> int:
+        """
+        Create many chunk nodes linked to a document.
+
+        chunks: List of dicts with 'id', 'content', 'chunk_index', 'milvus_id'.
+        Each batch of `CHUNK_WRITE_BATCH` rows is written with one UNWIND
+        statement inside a managed write transaction (retried on transient
+        errors).
+        """
+        if not chunks:
+            return 0
+
+        rows = [{
+            "id": chunk["id"],
+            "content": chunk["content"][:2000],
+            "chunk_index": chunk["chunk_index"],
+            "milvus_id": chunk.get("milvus_id")
+        } for chunk in chunks]
+
+        with self.driver.session(database=self.database) as session:
+            for start in range(0, len(rows), self.CHUNK_WRITE_BATCH):
+                session.execute_write(
+                    self._write_chunk_batch, doc_id, rows[start:start + self.CHUNK_WRITE_BATCH]
+                )
+
+        return len(rows)
+
+    @staticmethod
+    def _write_chunk_batch(tx, doc_id: str, rows: List[dict]):
+        tx.run("""
+            MATCH (d:Document {id: $doc_id})
+            UNWIND $rows AS row
+            MERGE (c:Chunk {id: row.id})
+            SET c.content = row.content,
+                c.chunk_index = row.chunk_index,
+                c.milvus_id = row.milvus_id,
+                c.doc_id = $doc_id
+            MERGE (d)-[:HAS_CHUNK]->(c)
+        """, doc_id=doc_id, rows=rows).consume()
+
+    @run_blocking("neo4j")
+    def update_chunk_indexes(self, updates: List[dict]):
+        """Set chunk_index on existing chunk nodes. updates: [{'id', 'chunk_index'}]."""
+        if not updates:
+            return
+
+        with self.driver.session(database=self.database) as session:
+            session.run("""
+                UNWIND $updates AS u
+                MATCH (c:Chunk {id: u.id})
+                SET c.chunk_index = u.chunk_index
+            """, updates=updates)
+
+    @run_blocking("neo4j")
+    def delete_chunk_nodes(self, chunk_ids: List[str]):
+        """Delete chunk nodes (and their HAS_CHUNK edges) by ID."""
+        if not chunk_ids:
+            return
+
+        with self.driver.session(database=self.database) as session:
+            session.run("""
+                MATCH (c:Chunk) WHERE c.id IN $chunk_ids
+                DETACH DELETE c
+            """, chunk_ids=chunk_ids)
+            logger.info(f"Deleted {len(chunk_ids)} chunk nodes")
+
+    @run_blocking("neo4j")
+    def delete_chunk_nodes_from(self, doc_id: str, from_index: int = 0):
+        """Delete a document's chunk nodes with chunk_index >= from_index."""
+        with self.driver.session(database=self.database) as session:
+            session.run("""
+                MATCH (c:Chunk {doc_id: $doc_id})
+                WHERE c.chunk_index >= $from_index
+                DETACH DELETE c
+            """, doc_id=doc_id, from_index=from_index)
+
     async def extract_and_create_entities(
         self,
         doc_id: str,
         content: str,
         entity_types: List[str] = None
-    ) -> int:
-        """Extract entities from content and create nodes."""
+    ) -> dict:
+        """
+        Extract entities from content and create nodes.
+
+        Returns {'count', 'created', 'matched'}.
+        """
         if entity_types is None:
             entity_types = ["Person", "Organization", "Concept", "Topic"]
 
         # Simple entity extraction (replace with LLM in production)
         entities = self._extract_entities(content)
 
+        return await self.upsert_entities(doc_id, entities)
+
+    @run_blocking("neo4j")
+    def upsert_entities(self, doc_id: str, entities: List[dict]) -> dict:
+        """
+        Upsert entities mentioned by a document with a single UNWIND.
+
+        Entities are scoped to the document's knowledge base (unique on
+        kb_id + name), so tenants never contend on shared Entity nodes.
+        Rows are sorted by name so concurrent writers lock nodes in the same
+        order. Returns {'count', 'created', 'matched'}.
+        """
+        if not entities:
+            return {"count": 0, "created": 0, "matched": 0}
+
+        rows = sorted(
+            ({"name": e["name"], "type": e["type"]} for e in entities),
+            key=lambda row: row["name"]
+        )
+
         with self.driver.session(database=self.database) as session:
-            for entity in entities:
-                session.run("""
-                    MATCH (d:Document {id: $doc_id})
-                    MERGE (e:Entity {name: $name})
-                    SET e.type = $type
-                    MERGE (d)-[:MENTIONS]->(e)
-                """, doc_id=doc_id, name=entity["name"], type=entity["type"])
+            created = session.execute_write(self._write_entities, doc_id, rows)
+
+        return {"count": len(rows), "created": created, "matched": len(rows) - created}
 
-        return len(entities)
+    @staticmethod
+    def _write_entities(tx, doc_id: str, rows: List[dict]) -> int:
+        summary = tx.run("""
+            MATCH (d:Document {id: $doc_id})
+            UNWIND $rows AS row
+            MERGE (e:Entity {kb_id: d.kb_id, name: row.name})
+            SET e.type = row.type
+            MERGE (d)-[:MENTIONS]->(e)
+        """, doc_id=doc_id, rows=rows).consume()
+        return summary.counters.nodes_created
 
     def _extract_entities(self, content: str) -> List[dict]:
         """Simple entity extraction. Replace with NER/LLM in production."""
@@ -131,7 +258,8 @@ class GraphService:
 
         return unique[:20]
 
-    async def delete_file_nodes(self, file_id: str):
+    @run_blocking("neo4j")
+    def delete_file_nodes(self, file_id: str):
         """Delete all nodes related to a file."""
         with self.driver.session(database=self.database) as session:
             session.run("""
@@ -141,7 +269,8 @@ class GraphService:
             """, file_id=file_id)
             logger.info(f"Deleted graph nodes for file: {file_id}")
 
-    async def delete_kb_nodes(self, kb_id: str):
+    @run_blocking("neo4j")
+    def delete_kb_nodes(self, kb_id: str):
         """Delete all nodes related to a knowledge base."""
         with self.driver.session(database=self.database) as session:
             session.run("""
@@ -150,9 +279,15 @@ class GraphService:
                 OPTIONAL MATCH (d)-[:HAS_CHUNK]->(c:Chunk)
                 DETACH DELETE c, d, k
             """, kb_id=kb_id)
+            # Entities are scoped per KB, and are not reachable once the documents are gone
+            session.run("""
+                MATCH (e:Entity {kb_id: $kb_id})
+                DETACH DELETE e
+            """, kb_id=kb_id)
             logger.info(f"Deleted graph nodes for KB: {kb_id}")
 
-    async def search(
+    @run_blocking("neo4j")
+    def search(
         self,
         query: str,
         kb_id: str,
@@ -183,7 +318,8 @@ class GraphService:
 
             return results
 
-    async def get_related_entities(
+    @run_blocking("neo4j")
+    def get_related_entities(
         self,
         doc_id: str,
         max_depth: int = 2
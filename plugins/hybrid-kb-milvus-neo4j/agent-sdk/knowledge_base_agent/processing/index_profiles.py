@@ -0,0 +1,103 @@
+"""
+Index Profiles - Milvus Index and Search Parameters
+====================================================
+Perfis de índice por knowledge base (HNSW, IVF, DISKANN) e parâmetros de busca.
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+# Per index type: default build params, default search params, and the
+# search params it accepts (others are ignored, so one request can carry
+# e.g. both `ef` and `nprobe` across KBs with different indexes).
+INDEX_TYPES: Dict[str, dict] = {
+    "AUTOINDEX": {"build": {}, "search": {}, "search_keys": {"level"}},
+    "FLAT": {"build": {}, "search": {}, "search_keys": set()},
+    "HNSW": {"build": {"M": 16, "efConstruction": 200}, "search": {"ef": 64}, "search_keys": {"ef"}},
+    "IVF_FLAT": {"build": {"nlist": 1024}, "search": {"nprobe": 16}, "search_keys": {"nprobe"}},
+    "IVF_SQ8": {"build": {"nlist": 1024}, "search": {"nprobe": 16}, "search_keys": {"nprobe"}},
+    "IVF_PQ": {"build": {"nlist": 1024, "m": 16, "nbits": 8}, "search": {"nprobe": 16}, "search_keys": {"nprobe"}},
+    "DISKANN": {"build": {}, "search": {"search_list": 100}, "search_keys": {"search_list"}},
+}
+
+CONSISTENCY_LEVELS = ("Strong", "Bounded", "Session", "Eventually")
+
+
+@dataclass
+class IndexProfile:
+    """
+    Vector index type and parameters of a knowledge base's collection.
+
+    `build_params` go to the index (M/efConstruction, nlist, m/nbits);
+    `search_params` are the KB's default search knobs (ef, nprobe,
+    search_list), which a request can override.
+
+    Usage:
+        profile = IndexProfile.create("HNSW", {"M": 32}, {"ef": 128})
+        profile.search_request({"ef": 256}, limit=10)
+    """
+
+    index_type: str = "AUTOINDEX"
+    build_params: dict = field(default_factory=dict)
+    search_params: dict = field(default_factory=dict)
+    metric_type: str = "COSINE"
+
+    @classmethod
+    def create(
+        cls,
+        index_type: str = "AUTOINDEX",
+        build_params: Optional[dict] = None,
+        search_params: Optional[dict] = None
+    ) -> "IndexProfile":
+        """Validated profile; missing params take the index type's defaults."""
+        index_type = (index_type or "AUTOINDEX").upper()
+        spec = INDEX_TYPES.get(index_type)
+        if spec is None:
+            raise ValueError(f"Unknown index type: {index_type} (expected one of {', '.join(INDEX_TYPES)})")
+
+        build_params = build_params or {}
+        unknown = set(build_params) - set(spec["build"])
+        if unknown:
+            raise ValueError(f"Unknown {index_type} build params: {', '.join(sorted(unknown))}")
+
+        search_params = search_params or {}
+        unknown = set(search_params) - spec["search_keys"]
+        if unknown:
+            raise ValueError(f"Unknown {index_type} search params: {', '.join(sorted(unknown))}")
+
+        return cls(
+            index_type=index_type,
+            build_params={**spec["build"], **build_params},
+            search_params={**spec["search"], **search_params}
+        )
+
+    @classmethod
+    def from_kb(cls, kb) -> "IndexProfile":
+        """The profile stored on a KnowledgeBase row."""
+        return cls.create(kb.index_type, kb.index_params, kb.search_params)
+
+    def validate_dimension(self, dim: int):
+        if self.index_type == "IVF_PQ" and dim % self.build_params["m"]:
+            raise ValueError(f"IVF_PQ m={self.build_params['m']} must divide the vector dimension {dim}")
+
+    def search_request(self, overrides: Optional[dict] = None, limit: int = None) -> dict:
+        """
+        Milvus `search_params` for a request: the KB defaults updated with the
+        overrides this index type understands.
+        """
+        keys = INDEX_TYPES[self.index_type]["search_keys"]
+        params = dict(self.search_params)
+        params.update({k: v for k, v in (overrides or {}).items() if k in keys})
+
+        # HNSW returns at most ef results
+        if "ef" in params and limit:
+            params["ef"] = max(params["ef"], limit)
+
+        return {"metric_type": self.metric_type, "params": params}
+
+    def as_dict(self) -> dict:
+        return {
+            "index_type": self.index_type,
+            "index_params": self.build_params,
+            "search_params": self.search_params
+        }
@@ -0,0 +1,277 @@
+"""
+Ingestion Jobs - Leases, Heartbeats and Checkpoints
+====================================================
+Jobs duráveis de ingestão: lease por worker, heartbeat, checkpoints e reaper.
+"""
+
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+import logging
+
+from sqlalchemy import update
+from sqlalchemy.sql import func
+
+from ..core.config import KBConfig
+from ..core.models import DatabaseManager, IngestionJob, JobStatus, KBFile, FileStatus
+
+logger = logging.getLogger(__name__)
+
+
+class LeaseLost(Exception):
+    """The job's lease expired and it was re-queued (or taken by another worker)."""
+
+
+@dataclass
+class JobLease:
+    """A job held by a worker, and its progress in the current attempt."""
+
+    job_id: str
+    file_id: str
+    worker_id: str
+    attempts: int
+    checkpoint_chunks: int = 0
+    checkpoint_offset: int = 0
+    checkpoint_key: Optional[str] = None
+    lost: bool = False
+    # Written batches not yet contiguous with the checkpoint: first index -> (next index, end offset)
+    _done: Dict[int, Tuple[int, int]] = field(default_factory=dict, repr=False)
+
+    @classmethod
+    def from_job(cls, job: IngestionJob, worker_id: str) -> "JobLease":
+        return cls(
+            job_id=str(job.id),
+            file_id=str(job.file_id),
+            worker_id=worker_id,
+            attempts=job.attempts,
+            checkpoint_chunks=job.checkpoint_chunks or 0,
+            checkpoint_offset=job.checkpoint_offset or 0,
+            checkpoint_key=job.checkpoint_key
+        )
+
+    def record_batch(self, first_index: int, next_index: int, end_offset: int) -> bool:
+        """
+        Record a written batch of chunks [first_index, next_index).
+
+        Batches may finish out of order; the checkpoint only advances over a
+        contiguous run. Returns True if it advanced.
+        """
+        self._done[first_index] = (next_index, end_offset)
+        advanced = False
+        while self.checkpoint_chunks in self._done:
+            self.checkpoint_chunks, self.checkpoint_offset = self._done.pop(self.checkpoint_chunks)
+            advanced = True
+        return advanced
+
+
+class JobStore:
+    """
+    Durable ingestion jobs in PostgreSQL (see IngestionJob).
+
+    A worker claims jobs with SKIP LOCKED and holds each one under a lease
+    that it renews with heartbeats (and with every checkpoint). If the
+    worker dies the lease expires and `reap` puts the job back in the
+    queue; the next worker resumes it from its checkpoint. A job whose
+    lease expired `ingestion_job_max_attempts` times is failed.
+    """
+
+    def __init__(self, db: DatabaseManager, config: KBConfig):
+        self.db = db
+        self.lease = timedelta(seconds=config.ingestion_lease_seconds)
+        self.max_attempts = max(1, config.ingestion_job_max_attempts)
+
+    def claim(self, worker_id: str, limit: int) -> List[JobLease]:
+        """
+        Lease up to `limit` jobs: re-queued jobs first, then new PENDING files.
+
+        Only files whose content is already in storage (size_bytes > 0) are
+        claimed; ZIP members are processed by their parent.
+        """
+        if limit <= 0:
+            return []
+
+        session = self.db.get_session()
+        try:
+            jobs = session.query(IngestionJob).filter(
+                IngestionJob.status == JobStatus.QUEUED
+            ).order_by(IngestionJob.created_at).limit(limit).with_for_update(skip_locked=True).all()
+
+            if len(jobs) < limit:
+                files = session.query(KBFile).filter(
+                    KBFile.status == FileStatus.PENDING,
+                    KBFile.minio_object_key.isnot(None),
+                    KBFile.size_bytes > 0,
+                    KBFile.is_from_zip.isnot(True)
+                ).order_by(KBFile.created_at).limit(limit - len(jobs)).with_for_update(skip_locked=True).all()
+
+                existing = {}
+                if files:
+                    existing = {
+                        job.file_id: job
+                        for job in session.query(IngestionJob).filter(
+                            IngestionJob.file_id.in_([file.id for file in files])
+                        ).with_for_update().all()
+                    }
+
+                for file in files:
+                    file.status = FileStatus.PROCESSING
+                    job = existing.get(file.id)
+                    if job is None:
+                        job = IngestionJob(file_id=file.id)
+                        session.add(job)
+                    else:
+                        # The file was queued again (e.g. reprocessed): start over
+                        job.attempts = 0
+                        job.checkpoint_chunks = 0
+                        job.checkpoint_offset = 0
+                        job.checkpoint_key = None
+                        job.last_error = None
+                    jobs.append(job)
+
+            for job in jobs:
+                job.status = JobStatus.RUNNING
+                job.worker_id = worker_id
+                job.attempts = (job.attempts or 0) + 1
+                job.heartbeat_at = func.now()
+                job.lease_expires_at = func.now() + self.lease
+
+            session.flush()
+            leases = [JobLease.from_job(job, worker_id) for job in jobs]
+            session.commit()
+            return leases
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Failed to claim ingestion jobs: {e}")
+            return []
+        finally:
+            session.close()
+
+    def heartbeat(self, worker_id: str, leases: List[JobLease]):
+        """Renew the leases of running jobs; flag the ones this worker no longer holds."""
+        if not leases:
+            return
+
+        session = self.db.get_session()
+        try:
+            held = session.execute(
+                update(IngestionJob).where(
+                    IngestionJob.id.in_([UUID(lease.job_id) for lease in leases]),
+                    IngestionJob.worker_id == worker_id,
+                    IngestionJob.status == JobStatus.RUNNING
+                ).values(
+                    heartbeat_at=func.now(),
+                    lease_expires_at=func.now() + self.lease
+                ).returning(IngestionJob.id)
+            ).scalars().all()
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Ingestion job heartbeat failed: {e}")
+            return
+        finally:
+            session.close()
+
+        held = {str(job_id) for job_id in held}
+        for lease in leases:
+            if lease.job_id not in held and not lease.lost:
+                lease.lost = True
+                logger.warning(f"Lost the lease on ingestion job for file {lease.file_id}")
+
+    def checkpoint(self, session, lease: JobLease):
+        """
+        Store the lease's checkpoint in `session` (committed by the caller,
+        together with the chunk rows it covers) and renew the lease.
+
+        Raises LeaseLost if the job is no longer held by this worker.
+        """
+        if lease.lost:
+            raise LeaseLost(f"Ingestion job for file {lease.file_id} was re-queued")
+
+        result = session.execute(
+            update(IngestionJob).where(
+                IngestionJob.id == UUID(lease.job_id),
+                IngestionJob.worker_id == lease.worker_id,
+                IngestionJob.status == JobStatus.RUNNING
+            ).values(
+                checkpoint_chunks=lease.checkpoint_chunks,
+                checkpoint_offset=lease.checkpoint_offset,
+                checkpoint_key=lease.checkpoint_key,
+                heartbeat_at=func.now(),
+                lease_expires_at=func.now() + self.lease
+            )
+        )
+        if result.rowcount == 0:
+            lease.lost = True
+            raise LeaseLost(f"Ingestion job for file {lease.file_id} was re-queued")
+
+    def complete(self, lease: JobLease):
+        self._finish(lease, JobStatus.COMPLETED)
+
+    def fail(self, lease: JobLease, error: str = None):
+        self._finish(lease, JobStatus.FAILED, error)
+
+    def _finish(self, lease: JobLease, status: JobStatus, error: str = None):
+        session = self.db.get_session()
+        try:
+            session.execute(
+                update(IngestionJob).where(
+                    IngestionJob.id == UUID(lease.job_id),
+                    IngestionJob.worker_id == lease.worker_id
+                ).values(
+                    status=status,
+                    last_error=error,
+                    worker_id=None,
+                    lease_expires_at=None
+                )
+            )
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Failed to finish ingestion job for file {lease.file_id}: {e}")
+        finally:
+            session.close()
+
+    def reap(self) -> dict:
+        """
+        Re-queue running jobs whose lease expired. Jobs that already used
+        all their attempts are failed, along with their file.
+
+        Returns {'requeued', 'failed'}.
+        """
+        session = self.db.get_session()
+        try:
+            jobs = session.query(IngestionJob).filter(
+                IngestionJob.status == JobStatus.RUNNING,
+                IngestionJob.lease_expires_at < func.now()
+            ).with_for_update(skip_locked=True).all()
+
+            failed = []
+            for job in jobs:
+                job.worker_id = None
+                job.lease_expires_at = None
+                if job.attempts >= self.max_attempts:
+                    job.status = JobStatus.FAILED
+                    job.last_error = f"Lease expired after {job.attempts} attempts"
+                    failed.append(job.file_id)
+                else:
+                    job.status = JobStatus.QUEUED
+
+            if failed:
+                session.query(KBFile).filter(KBFile.id.in_(failed)).update({
+                    KBFile.status: FileStatus.FAILED,
+                    KBFile.error_message: "Ingestion abandoned: worker lease expired too many times"
+                }, synchronize_session=False)
+
+            session.commit()
+
+            result = {"requeued": len(jobs) - len(failed), "failed": len(failed)}
+            if jobs:
+                logger.warning(f"Reaped expired ingestion jobs: {result}")
+            return result
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Failed to reap ingestion jobs: {e}")
+            return {"requeued": 0, "failed": 0}
+        finally:
+            session.close()
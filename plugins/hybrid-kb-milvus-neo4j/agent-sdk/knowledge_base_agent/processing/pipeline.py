@@ -0,0 +1,167 @@
+"""
+Pipeline - Staged Async Processing with Bounded Queues
+=======================================================
+Encadeia estágios assíncronos por filas limitadas (backpressure), com métricas.
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+class MeteredQueue(asyncio.Queue):
+    """asyncio.Queue that records depth and backpressure statistics."""
+
+    def __init__(self, name: str, maxsize: int):
+        super().__init__(maxsize)
+        self.name = name
+        self.puts = 0
+        self.blocked_puts = 0  # producer had to wait for a free slot
+        self.max_depth = 0
+        self._depth_total = 0
+
+    async def put(self, item):
+        if self.full():
+            self.blocked_puts += 1
+        await super().put(item)
+        if item is _DONE:
+            return
+        depth = self.qsize()
+        self.puts += 1
+        self.max_depth = max(self.max_depth, depth)
+        self._depth_total += depth
+
+    def stats(self) -> dict:
+        return {
+            "maxsize": self.maxsize,
+            "depth": self.qsize(),
+            "max_depth": self.max_depth,
+            "avg_depth": round(self._depth_total / self.puts, 2) if self.puts else 0.0,
+            "puts": self.puts,
+            "blocked_puts": self.blocked_puts
+        }
+
+
+@dataclass
+class Stage:
+    """
+    A pipeline stage: `fn` is awaited for every item by `workers` concurrent
+    workers. Its return value goes to the next stage (None drops the item).
+    """
+
+    name: str
+    fn: Callable[[Any], Awaitable[Any]]
+    workers: int = 1
+    items: int = field(default=0, init=False)
+    busy_seconds: float = field(default=0.0, init=False)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "items": self.items,
+            "busy_seconds": round(self.busy_seconds, 3)
+        }
+
+
+class Pipeline:
+    """
+    Runs a source and a chain of stages connected by bounded queues.
+
+    Each queue holds at most `queue_size` items, so a slow stage makes the
+    ones before it wait instead of buffering without limit, while faster
+    stages keep working on the next items (e.g. batch N is written while
+    batch N+1 is embedded). If any stage fails, the rest are cancelled and
+    the error is raised from `run`.
+
+    Usage:
+        pipeline = Pipeline(source(), [Stage("embed", embed, 2), Stage("write", write, 2)])
+        await pipeline.run()
+        pipeline.stats()
+    """
+
+    def __init__(self, source: AsyncIterator[Any], stages: List[Stage], queue_size: int = 4, name: str = "pipeline"):
+        if not stages:
+            raise ValueError("A pipeline needs at least one stage")
+
+        self.name = name
+        self.source = source
+        self.stages = stages
+        self.queues = [
+            MeteredQueue(stage.name, max(1, queue_size)) for stage in stages
+        ]
+        self.source_items = 0
+        self.elapsed_seconds: Optional[float] = None
+
+    async def run(self):
+        """Run until the source is exhausted and every stage has drained."""
+        started = time.monotonic()
+        tasks = [asyncio.create_task(self._feed())]
+        for i, stage in enumerate(self.stages):
+            outbox = self.queues[i + 1] if i + 1 < len(self.stages) else None
+            workers = [
+                asyncio.create_task(self._work(stage, self.queues[i], outbox))
+                for _ in range(max(1, stage.workers))
+            ]
+            tasks.append(asyncio.create_task(self._close_after(workers, outbox, i + 1)))
+
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        finally:
+            self.elapsed_seconds = time.monotonic() - started
+            logger.debug(f"{self.name} finished: {self.stats()}")
+
+    async def _feed(self):
+        inbox = self.queues[0]
+        async for item in self.source:
+            self.source_items += 1
+            await inbox.put(item)
+        for _ in range(max(1, self.stages[0].workers)):
+            await inbox.put(_DONE)
+
+    async def _work(self, stage: Stage, inbox: MeteredQueue, outbox: Optional[MeteredQueue]):
+        while True:
+            item = await inbox.get()
+            if item is _DONE:
+                return
+
+            started = time.monotonic()
+            result = await stage.fn(item)
+            stage.busy_seconds += time.monotonic() - started
+            stage.items += 1
+
+            if outbox is not None and result is not None:
+                await outbox.put(result)
+
+    async def _close_after(self, workers: List[asyncio.Task], outbox: Optional[MeteredQueue], next_index: int):
+        # Once every worker of a stage is done, tell the next stage's workers
+        try:
+            await asyncio.gather(*workers)
+        except BaseException:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            raise
+
+        if outbox is not None:
+            for _ in range(max(1, self.stages[next_index].workers)):
+                await outbox.put(_DONE)
+
+    def stats(self) -> dict:
+        """Per-stage throughput and per-queue depth metrics."""
+        return {
+            "elapsed_seconds": round(self.elapsed_seconds, 3) if self.elapsed_seconds is not None else None,
+            "source_items": self.source_items,
+            "stages": {stage.name: stage.stats() for stage in self.stages},
+            "queues": {queue.name: queue.stats() for queue in self.queues}
+        }
@@ -0,0 +1,295 @@
+"""
+Rate Control - Adaptive Concurrency for Embedding Providers
+============================================================
+Token buckets, concorrência AIMD e retentativas com backoff por provedor.
+"""
+
+import asyncio
+import random
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Optional, Tuple
+import logging
+
+from ..core.config import KBConfig
+
+logger = logging.getLogger(__name__)
+
+# HTTP statuses worth retrying; 429 and 5xx also mean "slow down"
+THROTTLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+def classify_error(error: BaseException) -> Tuple[bool, Optional[float]]:
+    """
+    (throttled, retry_after_seconds) for a provider SDK error.
+
+    Understands google.api_core errors (`code`, RetryInfo details), cohere
+    ApiError (`status_code`, `headers`) and anything carrying an HTTP
+    `response`. Timeouts and connection errors count as throttling too.
+    """
+    response = getattr(error, "response", None)
+    status = None
+    for candidate in (
+        getattr(error, "status_code", None),
+        getattr(error, "code", None),
+        getattr(response, "status_code", None)
+    ):
+        if isinstance(candidate, int):
+            status = candidate
+            break
+
+    throttled = status in THROTTLE_STATUSES or isinstance(error, (TimeoutError, ConnectionError))
+    if not throttled:
+        return False, None
+
+    headers = getattr(error, "headers", None) or getattr(response, "headers", None) or {}
+    retry_after = _parse_retry_after(headers.get("retry-after") or headers.get("Retry-After"))
+
+    if retry_after is None:
+        # gRPC RetryInfo (google.api_core)
+        for detail in getattr(error, "details", None) or ():
+            delay = getattr(detail, "retry_delay", None)
+            if delay is not None:
+                retry_after = delay.seconds + delay.nanos / 1e9
+                break
+
+    return True, retry_after
+
+
+def _parse_retry_after(value) -> Optional[float]:
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Token bucket refilled at `per_minute / 60` tokens per second, holding at
+    most `burst_seconds` worth of tokens. `per_minute` <= 0 means unlimited.
+
+    `reserve` takes tokens immediately (the balance may go negative) and
+    returns how long the caller must wait before using them, so concurrent
+    callers queue up in order without a lock.
+    """
+
+    def __init__(self, per_minute: float, burst_seconds: float = 10.0):
+        self.rate = per_minute / 60 if per_minute > 0 else 0.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, amount: float = 1.0) -> float:
+        if not self.rate:
+            return 0.0
+
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= min(amount, self.capacity)
+        return max(0.0, -self.tokens / self.rate)
+
+
+class AdaptiveLimit:
+    """
+    Concurrency limit with additive increase / multiplicative decrease.
+
+    Each success raises the limit by 1/limit (about +1 per round of
+    requests); a throttled request halves it, at most once per round (only
+    requests started after the last decrease can lower it again).
+    """
+
+    def __init__(self, initial: int, minimum: int = 1, maximum: int = 64, decrease: float = 0.5):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.decrease_factor = decrease
+        self.in_flight = 0
+        self.last_decrease = 0.0
+
+        self._loop = None
+        self._waiters = deque()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self):
+        self._bind_loop()
+        while self.in_flight >= int(self.limit):
+            waiter = self._loop.create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                else:
+                    self._wake()  # pass the slot we were given on
+                raise
+        self.in_flight += 1
+
+    def release(self):
+        self.in_flight -= 1
+        self._wake()
+
+    def on_success(self):
+        self.limit = min(self.maximum, self.limit + 1 / self.limit)
+        self._wake()
+
+    def on_throttle(self, started_at: float):
+        if started_at < self.last_decrease:
+            return  # already backed off for this round
+        self.limit = max(self.minimum, self.limit * self.decrease_factor)
+        self.last_decrease = time.monotonic()
+
+    def _wake(self):
+        free = int(self.limit) - self.in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    def _bind_loop(self):
+        # Waiters belong to one event loop
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._waiters = deque()
+            self.in_flight = 0
+
+
+class ProviderRateController:
+    """
+    Rate control for one embedding provider, shared by every caller.
+
+    Each request waits for a concurrency slot (AdaptiveLimit) and for its
+    share of the request and token buckets (the provider's published
+    per-minute quotas, if configured). Throttled requests (429, 5xx,
+    timeouts) shrink the concurrency limit and are retried with full-jitter
+    exponential backoff; a Retry-After from the provider pauses the whole
+    provider for that long. Successes grow the limit again, so throughput
+    settles at the highest rate the provider accepts.
+
+    Usage:
+        controller = ProviderRateController.from_config("google", config)
+        vectors = await controller.run(lambda: executors.run("embeddings", embed, texts), tokens=n)
+    """
+
+    def __init__(
+        self,
+        provider: str,
+        concurrency: int = 4,
+        max_concurrency: int = 32,
+        requests_per_minute: float = 0,
+        tokens_per_minute: float = 0,
+        max_retries: int = 5,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0
+    ):
+        self.provider = provider
+        self.limit = AdaptiveLimit(concurrency, maximum=max_concurrency)
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_retries = max(0, max_retries)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._paused_until = 0.0
+        self._counters = {
+            "requests": 0, "succeeded": 0, "throttled": 0, "retries": 0, "failed": 0,
+            "tokens": 0, "wait_seconds": 0.0
+        }
+
+    @classmethod
+    def from_config(cls, provider: str, config: KBConfig) -> "ProviderRateController":
+        quotas = config.embedding_rate_limits.get(provider, {})
+        # Requests run on the "embeddings" pool; slots beyond its threads would only queue there
+        return cls(
+            provider,
+            concurrency=config.embedding_concurrency,
+            max_concurrency=min(config.embedding_max_concurrency, config.embedding_threads),
+            requests_per_minute=quotas.get("requests_per_minute", 0),
+            tokens_per_minute=quotas.get("tokens_per_minute", 0),
+            max_retries=config.embedding_max_retries,
+            backoff_base=config.embedding_backoff_base,
+            backoff_max=config.embedding_backoff_max
+        )
+
+    async def run(self, call: Callable[[], Awaitable[Any]], tokens: int = 0) -> Any:
+        """Await `call()` under the provider's limits, retrying throttled attempts."""
+        attempt = 0
+        while True:
+            await self._wait_for_quota(tokens)
+            await self.limit.acquire()
+            started = time.monotonic()
+            self._counters["requests"] += 1
+            try:
+                result = await call()
+            except Exception as e:
+                throttled, retry_after = classify_error(e)
+                if not throttled:
+                    self._counters["failed"] += 1
+                    raise
+
+                self._counters["throttled"] += 1
+                self.limit.on_throttle(started)
+                if attempt >= self.max_retries:
+                    self._counters["failed"] += 1
+                    raise
+
+                delay = self._backoff(attempt, retry_after)
+                if retry_after is not None:
+                    self._paused_until = max(self._paused_until, time.monotonic() + delay)
+                logger.warning(
+                    f"{self.provider} throttled ({e}); retry {attempt + 1}/{self.max_retries} "
+                    f"in {delay:.1f}s, concurrency limit {int(self.limit.limit)}"
+                )
+            else:
+                self._counters["succeeded"] += 1
+                self._counters["tokens"] += tokens
+                self.limit.on_success()
+                return result
+            finally:
+                self.limit.release()
+
+            attempt += 1
+            self._counters["retries"] += 1
+            await self._sleep(delay)
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max * 4)
+        # Full jitter: spreads retries of requests throttled together
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def _wait_for_quota(self, tokens: int):
+        delay = max(
+            self._paused_until - time.monotonic(),
+            self.requests.reserve(1),
+            self.tokens.reserve(tokens) if tokens else 0.0
+        )
+        await self._sleep(delay)
+
+    async def _sleep(self, delay: float):
+        if delay > 0:
+            self._counters["wait_seconds"] += delay
+            await asyncio.sleep(delay)
+
+    def stats(self) -> dict:
+        """Current concurrency limit and request/throttle counters."""
+        return {
+            "concurrency_limit": int(self.limit.limit),
+            "in_flight": self.limit.in_flight,
+            "waiting": self.limit.waiting,
+            "paused_seconds": round(max(0.0, self._paused_until - time.monotonic()), 3),
+            **self._counters,
+            "wait_seconds": round(self._counters["wait_seconds"], 3)
+        }
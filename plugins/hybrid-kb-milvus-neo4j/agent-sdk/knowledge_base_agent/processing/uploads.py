@@ -0,0 +1,236 @@
+"""
+Upload Detector - Completion of Presigned Uploads
+==================================================
+Detecta uploads diretos (URL pré-assinada) concluídos e libera os arquivos para ingestão.
+"""
+
+import asyncio
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+from uuid import UUID
+import logging
+
+from sqlalchemy import bindparam, func, or_, tuple_, update
+
+from ..core.config import KBConfig
+from ..core.executors import BackendExecutors, get_executors
+from ..core.models import DatabaseManager, KBFile, FileStatus
+from ..storage import StorageManager
+
+logger = logging.getLogger(__name__)
+
+
+class UploadDetector:
+    """
+    Notices when clients finish direct-to-storage uploads.
+
+    `get_upload_url` creates a PENDING file with size_bytes = 0, which the
+    ingestion worker does not claim until the object exists. The detector
+    sets the file's size once the object is stored, making it claimable:
+
+    - `scan` stats the object keys of files awaiting upload in batches, on
+      the Minio thread pool, moving through the backlog from scan to scan.
+      Files whose upload URL expired without an object are marked FAILED.
+    - `start_listener` (optional) consumes Minio bucket notifications on a
+      background thread, so uploads are picked up as soon as they land.
+
+    `on_ready` is called (on the event loop) whenever files became
+    claimable; IngestionWorker uses it to wake up immediately.
+    """
+
+    # Extra time after the URL expires before an upload counts as abandoned
+    EXPIRY_GRACE_SECONDS = 300
+
+    def __init__(
+        self,
+        storage: StorageManager,
+        db: DatabaseManager,
+        config: KBConfig,
+        executors: BackendExecutors = None
+    ):
+        self.storage = storage
+        self.db = db
+        self.executors = executors or get_executors(config)
+        self.scan_batch = max(1, config.upload_scan_batch)
+        self.expiry = timedelta(seconds=config.upload_url_expiry_seconds + self.EXPIRY_GRACE_SECONDS)
+        self.on_ready: Optional[Callable[[], None]] = None
+        # (created_at, id) of the last file checked; the next scan continues after it
+        self._cursor: Optional[Tuple[datetime, UUID]] = None
+
+        self._listener: Optional[threading.Thread] = None
+        self._stop_listening = threading.Event()
+        self.stats = {"scans": 0, "detected": 0, "notified": 0, "expired": 0, "empty": 0}
+
+    async def scan(self) -> dict:
+        """
+        Check the next `upload_scan_batch` files awaiting upload, in
+        creation order, continuing where the previous scan stopped and
+        starting over from the oldest once the end is reached (files still
+        waiting for their upload never hold back newer ones).
+
+        Returns {'checked', 'ready', 'expired', 'empty'}.
+        """
+        session = self.db.get_session()
+        try:
+            query = session.query(KBFile.id, KBFile.minio_object_key, KBFile.created_at).filter(
+                self._awaiting_upload()
+            )
+            if self._cursor is not None:
+                query = query.filter(tuple_(KBFile.created_at, KBFile.id) > tuple_(*self._cursor))
+            pending = query.order_by(KBFile.created_at, KBFile.id).limit(self.scan_batch).all()
+        finally:
+            session.close()
+
+        # A short batch reached the end of the backlog
+        self._cursor = (pending[-1].created_at, pending[-1].id) if len(pending) == self.scan_batch else None
+
+        if not pending:
+            return {"checked": 0, "ready": 0, "expired": 0, "empty": 0}
+
+        sizes = await asyncio.gather(
+            *(self.executors.run("minio", self.storage.object_size, row.minio_object_key) for row in pending),
+            return_exceptions=True
+        )
+
+        uploaded, empty, missing = {}, [], []
+        for (file_id, key, _), size in zip(pending, sizes):
+            if isinstance(size, BaseException):
+                logger.warning(f"Could not stat {key}: {size}")
+            elif size is None:
+                missing.append(file_id)
+            elif size > 0:
+                uploaded[file_id] = size
+            else:
+                empty.append(file_id)
+
+        ready = self.mark_uploaded(uploaded)
+        expired = self._fail(missing, "Upload URL expired before the file was uploaded", only_expired=True)
+        emptied = self._fail(empty, "Uploaded file is empty")
+
+        self.stats["scans"] += 1
+        self.stats["detected"] += ready
+        self.stats["expired"] += expired
+        self.stats["empty"] += emptied
+        if ready:
+            self._notify_ready()
+
+        return {"checked": len(pending), "ready": ready, "expired": expired, "empty": emptied}
+
+    def mark_uploaded(self, sizes: Dict[UUID, int]) -> int:
+        """Record the stored size of files awaiting upload. Returns how many became claimable."""
+        if not sizes:
+            return 0
+
+        session = self.db.get_session()
+        try:
+            # Guarded by status/size so concurrent detectors update each file once
+            result = session.execute(
+                update(KBFile.__table__).where(
+                    KBFile.__table__.c.id == bindparam("file_id"),
+                    KBFile.__table__.c.status == FileStatus.PENDING,
+                    func.coalesce(KBFile.__table__.c.size_bytes, 0) == 0
+                ).values(size_bytes=bindparam("size")),
+                [{"file_id": file_id, "size": size} for file_id, size in sizes.items()]
+            )
+            session.commit()
+            # Drivers without a reliable executemany rowcount report -1
+            return result.rowcount if result.rowcount >= 0 else len(sizes)
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Failed to record completed uploads: {e}")
+            return 0
+        finally:
+            session.close()
+
+    def _fail(self, file_ids: List[UUID], reason: str, only_expired: bool = False) -> int:
+        if not file_ids:
+            return 0
+
+        session = self.db.get_session()
+        try:
+            query = session.query(KBFile).filter(KBFile.id.in_(file_ids), self._awaiting_upload())
+            if only_expired:
+                query = query.filter(KBFile.created_at < func.now() - self.expiry)
+            count = query.update(
+                {KBFile.status: FileStatus.FAILED, KBFile.error_message: reason},
+                synchronize_session=False
+            )
+            session.commit()
+            return count
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Failed to mark abandoned uploads: {e}")
+            return 0
+        finally:
+            session.close()
+
+    @staticmethod
+    def _awaiting_upload():
+        return (
+            (KBFile.status == FileStatus.PENDING)
+            & KBFile.minio_object_key.isnot(None)
+            & or_(KBFile.size_bytes.is_(None), KBFile.size_bytes == 0)
+            & KBFile.is_from_zip.isnot(True)
+        )
+
+    # ------------------------------------------------------------------
+    # Bucket notifications
+    # ------------------------------------------------------------------
+
+    def start_listener(self, prefix: str = "users/"):
+        """Consume Minio ObjectCreated notifications on a background thread."""
+        if self._listener is not None:
+            return
+
+        loop = asyncio.get_running_loop()
+        self._stop_listening.clear()
+        self._listener = threading.Thread(
+            target=self._listen, args=(loop, prefix), name="kb-upload-listener", daemon=True
+        )
+        self._listener.start()
+
+    def stop_listener(self):
+        """
+        Stop consuming notifications. The stream blocks between events, so
+        the thread exits on the next event (it is a daemon thread).
+        """
+        self._stop_listening.set()
+        self._listener = None
+
+    def _listen(self, loop: asyncio.AbstractEventLoop, prefix: str):
+        backoff = 1.0
+        while not self._stop_listening.is_set():
+            try:
+                for key, size in self.storage.listen_uploads(prefix):
+                    if self._stop_listening.is_set():
+                        return
+                    backoff = 1.0
+                    if self._mark_uploaded_key(key, size):
+                        self.stats["notified"] += 1
+                        loop.call_soon_threadsafe(self._notify_ready)
+            except Exception as e:
+                logger.warning(f"Bucket notification stream failed ({e}); reconnecting in {backoff:.0f}s")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 60.0)
+
+    def _mark_uploaded_key(self, object_key: str, size: int) -> bool:
+        session = self.db.get_session()
+        try:
+            file_id = session.query(KBFile.id).filter(
+                KBFile.minio_object_key == object_key,
+                self._awaiting_upload()
+            ).scalar()
+        finally:
+            session.close()
+
+        if file_id is None:
+            return False
+        if not size:
+            return self._fail([file_id], "Uploaded file is empty") > 0
+        return self.mark_uploaded({file_id: size}) > 0
+
+    def _notify_ready(self):
+        if self.on_ready is not None:
+            self.on_ready()
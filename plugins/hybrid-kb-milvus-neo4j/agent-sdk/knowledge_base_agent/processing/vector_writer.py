@@ -0,0 +1,215 @@
+"""
+Vector Writer - Batched Milvus Inserts/Upserts
+===============================================
+Agrupa escritas no Milvus por tamanho em bytes e número de linhas.
+"""
+
+import asyncio
+import json
+import time
+from typing import Dict, List, Optional, Tuple
+import logging
+
+from pymilvus import MilvusClient
+
+from ..core.config import KBConfig
+from ..core.executors import BackendExecutors, get_executors
+
+logger = logging.getLogger(__name__)
+
+
+class _PendingBatch:
+    """Rows waiting to be sent in one request, and the future callers await."""
+
+    def __init__(self, future: asyncio.Future):
+        self.rows: List[dict] = []
+        self.size = 0
+        self.future = future
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class VectorWriter:
+    """
+    Batching writer for Milvus inserts and upserts.
+
+    Rows are packed into requests bounded by both row count and estimated
+    payload size, so large documents stay under the gRPC message limit.
+    Up to `max_in_flight` requests run at once on the Milvus thread pool, so
+    the next batch is sent while the previous one is still being
+    acknowledged.
+
+    Rows written to the same collection by concurrently processed files
+    share batches: a partially filled batch waits `linger_ms` for more rows
+    before it is sent. `write` returns once all of the caller's rows are
+    stored, and raises if any of their batches failed.
+    """
+
+    ROW_OVERHEAD_BYTES = 64
+
+    def __init__(
+        self,
+        milvus: MilvusClient,
+        max_rows: int = 1000,
+        max_bytes: int = 16 * 1024 * 1024,
+        max_in_flight: int = 4,
+        linger_ms: int = 20,
+        executors: BackendExecutors = None
+    ):
+        self.milvus = milvus
+        self.executors = executors or get_executors()
+        self.max_rows = max(1, max_rows)
+        self.max_bytes = max(1, max_bytes)
+        self.max_in_flight = max(1, max_in_flight)
+        self.linger = max(0, linger_ms) / 1000
+
+        self._loop = None
+        self._pending: Dict[Tuple[str, str], _PendingBatch] = {}
+        self._slots = None
+        self._tasks = set()
+
+        self._in_flight = 0
+        self._busy_since = 0.0
+        self._counters = {"rows": 0, "batches": 0, "failed_batches": 0, "bytes": 0, "busy_seconds": 0.0}
+
+    @classmethod
+    def from_config(cls, milvus: MilvusClient, config: KBConfig, executors: BackendExecutors = None) -> "VectorWriter":
+        return cls(
+            milvus,
+            max_rows=config.milvus_batch_rows,
+            max_bytes=config.milvus_batch_max_mb * 1024 * 1024,
+            max_in_flight=config.milvus_write_concurrency,
+            linger_ms=config.milvus_write_linger_ms,
+            executors=executors or get_executors(config)
+        )
+
+    @classmethod
+    def estimate_row_bytes(cls, row: dict) -> int:
+        """Approximate serialized size of a row (float32 vectors, UTF-8 strings)."""
+        size = cls.ROW_OVERHEAD_BYTES
+        for value in row.values():
+            if isinstance(value, str):
+                size += len(value) if value.isascii() else len(value.encode("utf-8"))
+            elif isinstance(value, (list, tuple)):
+                size += 4 * len(value)
+            elif isinstance(value, dict):
+                size += len(json.dumps(value, default=str))
+            else:
+                size += 8
+        return size
+
+    async def write(self, collection_name: str, rows: List[dict], upsert: bool = False) -> int:
+        """Queue rows for `collection_name` and wait until they are stored."""
+        if not rows:
+            return 0
+
+        self._bind_loop()
+        key = (collection_name, "upsert" if upsert else "insert")
+        waits = []
+
+        for row in rows:
+            size = self.estimate_row_bytes(row)
+            batch = self._pending.get(key)
+            if batch and (len(batch.rows) >= self.max_rows or batch.size + size > self.max_bytes):
+                self._flush(key)
+                batch = None
+
+            if batch is None:
+                batch = self._new_batch(key)
+
+            batch.rows.append(row)
+            batch.size += size
+            if not waits or waits[-1] is not batch.future:
+                waits.append(batch.future)
+
+        batch = self._pending.get(key)
+        if batch and (len(batch.rows) >= self.max_rows or not self.linger):
+            self._flush(key)
+
+        results = await asyncio.gather(*waits, return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        return len(rows)
+
+    async def flush(self):
+        """Send every pending batch now and wait for all in-flight requests."""
+        self._bind_loop()
+        for key in list(self._pending):
+            self._flush(key)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def _bind_loop(self):
+        # Pending batches and the semaphore belong to one event loop
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._pending = {}
+            self._tasks = set()
+            self._slots = asyncio.Semaphore(self.max_in_flight)
+
+    def _new_batch(self, key: Tuple[str, str]) -> _PendingBatch:
+        batch = _PendingBatch(self._loop.create_future())
+        if self.linger:
+            batch.timer = self._loop.call_later(self.linger, self._flush, key, batch)
+        self._pending[key] = batch
+        return batch
+
+    def _flush(self, key: Tuple[str, str], batch: _PendingBatch = None):
+        current = self._pending.get(key)
+        if current is None or (batch is not None and current is not batch):
+            return  # already sent
+
+        del self._pending[key]
+        if current.timer:
+            current.timer.cancel()
+
+        task = self._loop.create_task(self._send(key, current))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, key: Tuple[str, str], batch: _PendingBatch):
+        collection_name, operation = key
+        async with self._slots:
+            self._enter()
+            try:
+                await self.executors.run(
+                    "milvus",
+                    getattr(self.milvus, operation),
+                    collection_name=collection_name,
+                    data=batch.rows
+                )
+            except Exception as e:
+                self._counters["failed_batches"] += 1
+                logger.error(f"Milvus {operation} of {len(batch.rows)} rows into {collection_name} failed: {e}")
+                batch.future.set_exception(e)
+            else:
+                self._counters["rows"] += len(batch.rows)
+                self._counters["batches"] += 1
+                self._counters["bytes"] += batch.size
+                batch.future.set_result(len(batch.rows))
+            finally:
+                self._leave()
+
+    def _enter(self):
+        if self._in_flight == 0:
+            self._busy_since = time.monotonic()
+        self._in_flight += 1
+
+    def _leave(self):
+        self._in_flight -= 1
+        if self._in_flight == 0:
+            self._counters["busy_seconds"] += time.monotonic() - self._busy_since
+
+    def stats(self) -> dict:
+        """Rows/batches written and throughput (rows/s while requests were in flight)."""
+        busy = self._counters["busy_seconds"]
+        if self._in_flight:
+            busy += time.monotonic() - self._busy_since
+        return {
+            **self._counters,
+            "busy_seconds": round(busy, 3),
+            "rows_per_second": round(self._counters["rows"] / busy, 1) if busy else 0.0,
+            "in_flight": self._in_flight,
+            "pending_batches": len(self._pending)
+        }
@@ -0,0 +1,193 @@
+"""
+Ingestion Worker - Concurrent File Processing
+==============================================
+Processa vários arquivos em paralelo, com limite de concorrência.
+"""
+
+import os
+import uuid
+import socket
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+import logging
+
+from ..core.models import DatabaseManager
+from .jobs import JobLease, LeaseLost
+from .uploads import UploadDetector
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class IngestionStats:
+    """Aggregate throughput counters for a batch of processed files."""
+
+    files_processed: int = 0
+    files_failed: int = 0
+    chunks_created: int = 0
+    embeddings_reused: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+
+    def record(self, result: dict):
+        """Record the result dict returned by FileProcessor.process_file."""
+        if result.get("success"):
+            self.files_processed += 1
+            self.chunks_created += result.get("chunks_created", result.get("total_chunks", 0))
+            self.embeddings_reused += result.get("embeddings_reused", 0)
+        elif not result.get("skipped"):
+            self.files_failed += 1
+
+    @property
+    def elapsed_seconds(self) -> float:
+        return time.monotonic() - self.started_at
+
+    def as_dict(self) -> dict:
+        elapsed = max(self.elapsed_seconds, 1e-9)
+        return {
+            "files_processed": self.files_processed,
+            "files_failed": self.files_failed,
+            "chunks_created": self.chunks_created,
+            "embeddings_reused": self.embeddings_reused,
+            "elapsed_seconds": round(self.elapsed_seconds, 3),
+            "files_per_second": round((self.files_processed + self.files_failed) / elapsed, 3),
+            "chunks_per_second": round(self.chunks_created / elapsed, 3)
+        }
+
+
+class IngestionWorker:
+    """
+    Long-running worker that drains PENDING files.
+
+    Files are claimed in small batches and processed concurrently, up to
+    `concurrency` at a time. Each file runs in its own DB session
+    (FileProcessor.process_file opens one per call).
+
+    Every claimed file is a leased IngestionJob (see processing.jobs): the
+    worker heartbeats its leases every `ingestion_heartbeat_seconds`, and on
+    each poll re-queues jobs whose lease expired because their worker died.
+    Those are claimed before new files and resume from their checkpoint.
+
+    Files uploaded directly to storage (presigned URLs) become claimable
+    once the UploadDetector sees their object: the worker scans for them
+    every `upload_scan_interval` seconds and, with `upload_notifications`,
+    also listens to bucket notifications. Either wakes the worker at once.
+
+    Usage:
+        worker = IngestionWorker(processor, db, concurrency=8)
+        task = asyncio.create_task(worker.run())
+        ...
+        worker.stop()
+        await task
+    """
+
+    def __init__(
+        self,
+        processor,
+        db: DatabaseManager,
+        concurrency: int = None,
+        poll_interval: float = None
+    ):
+        self.processor = processor
+        self.db = db
+        self.concurrency = max(1, concurrency or processor.config.ingestion_concurrency)
+        self.poll_interval = poll_interval or processor.config.ingestion_poll_interval
+        self.jobs = processor.jobs
+        self.heartbeat_interval = processor.config.ingestion_heartbeat_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.stats = IngestionStats()
+        self._leases: Dict[str, JobLease] = {}
+        self._stop = asyncio.Event()
+        self._wake = asyncio.Event()
+
+        config = processor.config
+        self.upload_scan_interval = config.upload_scan_interval
+        self.upload_notifications = config.upload_notifications
+        self.uploads = UploadDetector(processor.storage, db, config, processor.executors)
+        self.uploads.on_ready = self._wake.set
+        self._last_upload_scan = 0.0
+
+    def stop(self):
+        """Ask the worker to stop after in-flight files finish."""
+        self._stop.set()
+        self._wake.set()
+
+    async def run(self) -> dict:
+        """Process pending files until stop() is called. Returns throughput stats."""
+        in_flight = set()
+        logger.info(f"Ingestion worker {self.worker_id} started (concurrency={self.concurrency})")
+        heartbeat = asyncio.create_task(self._heartbeat())
+        if self.upload_notifications:
+            self.uploads.start_listener()
+
+        while not self._stop.is_set():
+            self._wake.clear()
+            self.jobs.reap()
+            await self._scan_uploads()
+
+            free = self.concurrency - len(in_flight)
+            if free > 0:
+                for lease in self.claim_pending(free):
+                    in_flight.add(asyncio.create_task(self._process(lease)))
+
+            # Sleep until a file finishes, an upload lands, stop() or the poll interval
+            wake = asyncio.create_task(self._wake.wait())
+            await asyncio.wait(in_flight | {wake}, timeout=self.poll_interval, return_when=asyncio.FIRST_COMPLETED)
+            wake.cancel()
+            in_flight = {task for task in in_flight if not task.done()}
+
+        if in_flight:
+            await asyncio.wait(in_flight)
+        heartbeat.cancel()
+        self.uploads.stop_listener()
+
+        stats = self.stats.as_dict()
+        logger.info(f"Ingestion worker stopped: {stats}")
+        return stats
+
+    def claim_pending(self, limit: int) -> List[JobLease]:
+        """
+        Lease up to `limit` jobs: re-queued ones first, then PENDING files
+        (marked PROCESSING).
+
+        Uses SKIP LOCKED so several workers can poll the same tables safely.
+        """
+        return self.jobs.claim(self.worker_id, limit)
+
+    async def _scan_uploads(self):
+        if not self.upload_scan_interval:
+            return
+        now = time.monotonic()
+        if now - self._last_upload_scan < self.upload_scan_interval:
+            return
+        self._last_upload_scan = now
+        try:
+            await self.uploads.scan()
+        except Exception as e:
+            logger.error(f"Upload scan failed: {e}")
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            self.jobs.heartbeat(self.worker_id, list(self._leases.values()))
+
+    async def _process(self, lease: JobLease) -> Optional[dict]:
+        self._leases[lease.job_id] = lease
+        try:
+            result = await self.processor.process_file(lease.file_id, job=lease)
+        except LeaseLost as e:
+            logger.warning(f"Worker gave up file {lease.file_id}: {e}")
+            return None
+        except Exception as e:
+            logger.error(f"Worker failed on file {lease.file_id}: {e}")
+            result = {"success": False, "error": str(e)}
+        finally:
+            del self._leases[lease.job_id]
+
+        if result.get("success"):
+            self.jobs.complete(lease)
+        else:
+            self.jobs.fail(lease, result.get("error"))
+        self.stats.record(result)
+        return result
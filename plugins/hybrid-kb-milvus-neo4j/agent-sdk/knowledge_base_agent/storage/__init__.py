@@ -1,5 +1,5 @@
 """Storage Module - Minio Integration."""
 
-from .manager import StorageManager
+from .manager import StorageManager, ZipMember
 
-__all__ = ["StorageManager"]
+__all__ = ["StorageManager", "ZipMember"]
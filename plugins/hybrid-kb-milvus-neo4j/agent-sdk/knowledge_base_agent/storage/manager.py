@@ -4,9 +4,13 @@ Storage Manager - Minio File Storage
 """
 
 import io
+import uuid
 import zipfile
+import tempfile
+from contextlib import contextmanager
 from datetime import timedelta
-from typing import List, Tuple, BinaryIO
+from typing import BinaryIO, Callable, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+from urllib.parse import unquote_plus
 import logging
 
 from minio import Minio
@@ -17,6 +21,14 @@ from ..core.config import KBConfig
 logger = logging.getLogger(__name__)
 
 
+class ZipMember(NamedTuple):
+    """A file inside a ZIP archive; `open()` returns a fresh decompressing stream."""
+    filename: str
+    mime_type: str
+    size_bytes: int
+    open: Callable[[], BinaryIO]
+
+
 class StorageManager:
     """Manages file storage in Minio."""
 
@@ -33,6 +45,9 @@ class StorageManager:
         'zip': 'application/zip',
     }
 
+    # Size of each read when streaming objects out of Minio
+    DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
     def __init__(self, config: KBConfig):
         self.config = config
         self.bucket = config.minio_bucket
@@ -59,6 +74,12 @@ class StorageManager:
         """Generate structured object key."""
         return f"users/{user_id}/kbs/{kb_id}/files/{file_id}/{filename}"
 
+    def revision_object_key(self, object_key: str) -> str:
+        """A new key next to `object_key`, for another version of the same file."""
+        folder, filename = object_key.rsplit('/', 1)
+        folder = folder.split('/revisions/', 1)[0]
+        return f"{folder}/revisions/{uuid.uuid4().hex}/{filename}"
+
     def get_mime_type(self, filename: str) -> str:
         """Get MIME type from filename."""
         ext = filename.lower().split('.')[-1] if '.' in filename else ''
@@ -100,6 +121,27 @@ class StorageManager:
         logger.info(f"Uploaded: {object_key}")
         return result.etag
 
+    def upload_stream(
+        self,
+        object_key: str,
+        stream: BinaryIO,
+        length: int,
+        content_type: str = None
+    ) -> str:
+        """Upload file content from a stream of known length."""
+        if content_type is None:
+            content_type = self.get_mime_type(object_key)
+
+        result = self.client.put_object(
+            self.bucket,
+            object_key,
+            stream,
+            length,
+            content_type=content_type
+        )
+        logger.info(f"Uploaded: {object_key}")
+        return result.etag
+
     def download_file(self, object_key: str) -> bytes:
         """Download file content."""
         response = self.client.get_object(self.bucket, object_key)
@@ -108,6 +150,100 @@ class StorageManager:
         response.release_conn()
         return data
 
+    def iter_download(self, object_key: str, chunk_size: int = None) -> Iterator[bytes]:
+        """Stream file content in chunks without holding the whole object in memory."""
+        response = self.client.get_object(self.bucket, object_key)
+        try:
+            yield from response.stream(chunk_size or self.DOWNLOAD_CHUNK_SIZE)
+        finally:
+            response.close()
+            response.release_conn()
+
+    @contextmanager
+    def download_spooled(self, object_key: str, max_memory: int = None) -> Iterator[BinaryIO]:
+        """
+        Download file content into a seekable file object, streamed in chunks.
+
+        Objects up to `max_memory` bytes (default: config.spool_max_memory_mb)
+        are kept in a BytesIO; larger ones are spooled to a named temporary
+        file, which callers can open by path or memory-map. The file is
+        removed when the context exits.
+        """
+        spool = self.download_to_spool(object_key, max_memory)
+        try:
+            yield spool
+        finally:
+            spool.close()
+
+    def download_to_spool(self, object_key: str, max_memory: int = None) -> BinaryIO:
+        """Like download_spooled, but returns the open spool; the caller must close it."""
+        response = self.client.get_object(self.bucket, object_key)
+        try:
+            size = int(response.headers.get("Content-Length") or 0)
+            return self._spool(response.stream(self.DOWNLOAD_CHUNK_SIZE), size, max_memory)
+        finally:
+            response.close()
+            response.release_conn()
+
+    @contextmanager
+    def spool_stream(self, stream: BinaryIO, size: int, max_memory: int = None) -> Iterator[BinaryIO]:
+        """Copy a (non-seekable) stream into a seekable file, like download_spooled."""
+        spool = self.stream_to_spool(stream, size, max_memory)
+        try:
+            yield spool
+        finally:
+            spool.close()
+
+    def stream_to_spool(self, stream: BinaryIO, size: int, max_memory: int = None) -> BinaryIO:
+        """Like spool_stream, but returns the open spool; the caller must close it."""
+        chunks = iter(lambda: stream.read(self.DOWNLOAD_CHUNK_SIZE), b"")
+        return self._spool(chunks, size, max_memory)
+
+    def _spool(self, chunks: Iterable[bytes], size: int, max_memory: int = None) -> BinaryIO:
+        """Write chunks to a BytesIO or a named temp file, depending on size."""
+        if max_memory is None:
+            max_memory = self.config.spool_max_memory_mb * 1024 * 1024
+
+        if size and size <= max_memory:
+            spool = io.BytesIO()
+        else:
+            # Returned open: the caller owns it (closed below only if writing fails)
+            spool = tempfile.NamedTemporaryFile(prefix="kb-download-")  # noqa: SIM115
+
+        try:
+            for chunk in chunks:
+                spool.write(chunk)
+        except Exception:
+            spool.close()
+            raise
+
+        spool.seek(0)
+        return spool
+
+    def object_size(self, object_key: str) -> Optional[int]:
+        """Size of a stored object, or None if it does not exist (yet)."""
+        try:
+            return self.client.stat_object(self.bucket, object_key).size
+        except S3Error as e:
+            if e.code in ("NoSuchKey", "NoSuchObject"):
+                return None
+            raise
+
+    def listen_uploads(self, prefix: str = "") -> Iterator[Tuple[str, int]]:
+        """
+        Yield (object_key, size) for every object created in the bucket, as
+        Minio reports it (bucket notification stream; blocks between events).
+        Close the returned generator to stop listening.
+        """
+        with self.client.listen_bucket_notification(
+            self.bucket, prefix=prefix, events=("s3:ObjectCreated:*",)
+        ) as events:
+            for event in events:
+                for record in event.get("Records") or []:
+                    obj = record.get("s3", {}).get("object", {})
+                    if obj.get("key"):
+                        yield unquote_plus(obj["key"]), obj.get("size", 0)
+
     def delete_file(self, object_key: str):
         """Delete a file."""
         self.client.remove_object(self.bucket, object_key)
@@ -124,12 +260,30 @@ class StorageManager:
         logger.info(f"Deleted {count} objects for KB {kb_id}")
         return count
 
-    def extract_zip(self, object_key: str) -> List[Tuple[str, bytes, str]]:
-        """Extract ZIP file contents."""
-        zip_data = self.download_file(object_key)
-        extracted = []
+    @contextmanager
+    def open_zip_members(
+        self,
+        source: BinaryIO,
+        max_members: int = None,
+        max_total_bytes: int = None
+    ) -> Iterator[List[ZipMember]]:
+        """
+        Open a ZIP archive and list the files in it.
+
+        `source` must be a seekable binary file (e.g. from download_spooled).
+        Members are never read up front: each ZipMember opens its own stream
+        on demand, which is only possible while the context is open, so keep
+        it open until every member has been read. The archive's declared
+        member count and total uncompressed size are checked on entry, and a
+        ValueError is raised when they exceed the configured limits.
+        """
+        if max_members is None:
+            max_members = self.config.zip_max_members
+        if max_total_bytes is None:
+            max_total_bytes = self.config.zip_max_uncompressed_mb * 1024 * 1024
 
-        with zipfile.ZipFile(io.BytesIO(zip_data), 'r') as zip_ref:
+        with zipfile.ZipFile(source, 'r') as zip_ref:
+            members = []
             for file_info in zip_ref.infolist():
                 if file_info.is_dir() or file_info.filename.startswith('__MACOSX'):
                     continue
@@ -138,11 +292,26 @@ class StorageManager:
                 if not filename or filename.startswith('.'):
                     continue
 
-                content = zip_ref.read(file_info.filename)
-                mime_type = self.get_mime_type(filename)
-                extracted.append((filename, content, mime_type))
+                members.append((filename, file_info))
+
+            if len(members) > max_members:
+                raise ValueError(f"ZIP has {len(members)} files (limit: {max_members})")
+
+            total_bytes = sum(file_info.file_size for _, file_info in members)
+            if total_bytes > max_total_bytes:
+                raise ValueError(
+                    f"ZIP uncompressed size is {total_bytes} bytes (limit: {max_total_bytes})"
+                )
 
-        return extracted
+            yield [
+                ZipMember(
+                    filename=filename,
+                    mime_type=self.get_mime_type(filename),
+                    size_bytes=file_info.file_size,
+                    open=lambda file_info=file_info: zip_ref.open(file_info)
+                )
+                for filename, file_info in members
+            ]
 
     def health_check(self) -> dict:
         """Check Minio health."""
@@ -0,0 +1,136 @@
+"""
+Concurrent searches must overlap on the backend thread pools instead of
+blocking the event loop one after another.
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from knowledge_base_agent.core import executors
+from knowledge_base_agent.core.config import KBConfig
+from knowledge_base_agent.processing import embeddings, graph
+from knowledge_base_agent.processing.embeddings import EmbeddingService
+from knowledge_base_agent.processing.graph import GraphService
+
+SLEEP = 0.3
+SEARCHES = 5
+
+
+class FakeMilvusClient:
+    def __init__(self, uri=None, **kwargs):
+        pass
+
+    def search(self, collection_name, data, limit, **kwargs):
+        time.sleep(SLEEP)
+        return [[{"id": f"{collection_name}-0", "distance": 0.9, "entity": {"text": "hit"}}]]
+
+
+class FakeGenai:
+    @staticmethod
+    def configure(**kwargs):
+        pass
+
+    @staticmethod
+    def embed_content(model, content, task_type):
+        time.sleep(SLEEP)
+        return {"embedding": [[0.1] * 768 for _ in content]}
+
+
+class FakeSession:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def run(self, cypher, **params):
+        if "MATCH" in cypher:
+            time.sleep(SLEEP)
+            return [{"chunk_id": "c1", "content": "hit", "chunk_index": 0, "file_id": "f1", "filename": "a.txt"}]
+        return []
+
+
+class FakeDriver:
+    def session(self, database=None):
+        return FakeSession()
+
+
+class FakeGraphDatabase:
+    @staticmethod
+    def driver(uri, auth=None):
+        return FakeDriver()
+
+
+@pytest.fixture
+def config(monkeypatch):
+    monkeypatch.setattr(embeddings, "MilvusClient", FakeMilvusClient)
+    monkeypatch.setattr(embeddings, "genai", FakeGenai)
+    monkeypatch.setattr(graph, "GraphDatabase", FakeGraphDatabase)
+    # Fresh pools sized by this test's config
+    monkeypatch.setattr(executors, "_executors", None)
+    config = KBConfig(
+        google_api_key="test",
+        embedding_cache_enabled=False,
+        embedding_concurrency=SEARCHES,
+        embedding_threads=SEARCHES,
+        milvus_threads=SEARCHES,
+        neo4j_threads=SEARCHES
+    )
+    yield config
+    executors.get_executors().shutdown(wait=False)
+
+
+async def timed(coros):
+    started = time.monotonic()
+    results = await asyncio.gather(*coros)
+    return results, time.monotonic() - started
+
+
+async def test_vector_searches_run_concurrently(config):
+    service = EmbeddingService(config)
+
+    results, elapsed = await timed(
+        service.search(f"kb_{i}", "query") for i in range(SEARCHES)
+    )
+
+    assert all(len(hits) == 1 for hits in results)
+    # One embedding sleep plus one Milvus sleep, not SEARCHES of each
+    assert elapsed < 3 * SLEEP
+
+
+async def test_graph_searches_run_concurrently(config):
+    service = GraphService(config)
+
+    results, elapsed = await timed(
+        service.search("query", kb_id=f"kb-{i}") for i in range(SEARCHES)
+    )
+
+    assert all(len(hits) == 1 for hits in results)
+    assert elapsed < 2 * SLEEP
+
+
+async def test_event_loop_stays_responsive(config):
+    vectors = EmbeddingService(config)
+    graphs = GraphService(config)
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    ticking = asyncio.ensure_future(ticker())
+    try:
+        _, elapsed = await timed([
+            *(vectors.search(f"kb_{i}", "query") for i in range(SEARCHES)),
+            *(graphs.search("query", kb_id=f"kb-{i}") for i in range(SEARCHES))
+        ])
+    finally:
+        ticking.cancel()
+
+    assert elapsed < 3 * SLEEP
+    # The loop kept running while the fakes slept on the pools
+    assert ticks >= 10